@@ -1,13 +1,34 @@
+import time
+import uuid
 import streamlit as st
+import pandas as pd
 from datetime import datetime
-from cloud_config import CONTAINER_NAME, ENDPOINT, DATABASE_NAME, llmclient, KEY
-from topicmodelling_dev import extract_topics_from_text
-from preprocessor import preprocess_text
-from azure.cosmos import CosmosClient
-
-client = CosmosClient(ENDPOINT, KEY)
-database = client.get_database_client(DATABASE_NAME)
-container = database.get_container_client(CONTAINER_NAME)
+from cloud_config import (
+    CHANGE_FEED_ENABLED,
+    JOB_POLL_INTERVAL,
+    LOCAL_STORE_SYNC_INTERVAL,
+    TOPIC_DRIFT_REFRESH_INTERVAL,
+    get_container,
+    get_llm_client,
+)
+from dedup import format_title_groups
+from quarterly_topics import QUARTER_RANGES, to_timestamp
+from retrieval import HISTORY_MESSAGES, relevant_titles
+from volume_analytics import PERIODS, rollup_volume
+import change_feed
+import embeddings
+import fetch_pipeline
+import instrumentation
+import jobs
+import local_store
+import rolling_aggregates
+import topic_drift
+
+container = get_container()
+
+# Keeps the local mirror and its aggregates current in the background, so
+# views need not query Cosmos per viewer
+feed_consumer = change_feed.start_consumer(container) if CHANGE_FEED_ENABLED else None
 
 # Initialize session state
 if "chats" not in st.session_state:
@@ -18,6 +39,72 @@ if "Analysis" not in st.session_state:
     st.session_state["Analysis"] = ""
 if "current_view" not in st.session_state:
     st.session_state["current_view"] = "Chat"  # Default view is Chat
+if "diagnostics_run" not in st.session_state:
+    st.session_state["diagnostics_run"] = f"session-{uuid.uuid4().hex[:8]}"
+
+if "previous_requests" not in st.session_state:
+    st.session_state["previous_requests"] = []
+
+
+def submit_fetch(request):
+    """
+    Run a fetch and its analysis as a background job, so reruns do not repeat
+    them; an identical fetch in flight is joined, and this session's previous
+    job is cancelled unless others hold it.
+    """
+    st.session_state["job"] = jobs.get_runner().submit(
+        fetch_pipeline.job_key(request),
+        fetch_pipeline.run_fetch,
+        request,
+        owner=st.session_state["diagnostics_run"],
+        description=f"fetch {request.filter_option}",
+    )
+    st.session_state["fetch_request"] = request
+    st.session_state["fetch_message"] = ""
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def wait_for_job(state_key):
+    """Show the progress of a background job, rerunning the app once it is done."""
+    job = st.session_state[state_key]
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=job.message or "Waiting for a worker...")
+
+
+def keep_store_current():
+    """
+    Sync the local store in a background job once a sync is due, unless the
+    change-feed consumer keeps it current. Views read what the store holds
+    meanwhile. Returns the session's running sync job, if any.
+    """
+    job = st.session_state.get("sync_job")
+    if job is not None and not job.done:
+        return job
+    if change_feed.is_current():
+        return None
+    # A failed sync is retried once the sync interval has passed
+    if job is not None and job.state == jobs.FAILED and time.time() - job.finished < LOCAL_STORE_SYNC_INTERVAL:
+        st.caption(f"Syncing chat entries failed: {job.error}")
+        return None
+    store = local_store.connect()
+    try:
+        due = local_store.sync_due(store)
+    finally:
+        store.close()
+    if not due:
+        return None
+    st.session_state["sync_job"] = jobs.get_runner().submit(
+        ("sync",),
+        fetch_pipeline.run_sync,
+        owner=(st.session_state["diagnostics_run"], "sync"),
+        description="sync local store",
+    )
+    return st.session_state["sync_job"]
+
+
+# Tag the metrics recorded during this script run with the session
+instrumentation.set_run(st.session_state["diagnostics_run"])
 
 st.title("Chat DB Analytics")
 
@@ -131,26 +218,34 @@ with st.sidebar:
         start_offset = None  # Disable the offset for custom date range filtering
 
     elif filter_option == "Number of Entries":
-        # Slider to select the range of entries to fetch
-        query_len = """SELECT VALUE COUNT(c.id) FROM c """
-        res = list(
-            container.query_items(query=query_len, enable_cross_partition_query=True)
-        )
-        num_ent = res[0]
-        limit = st.slider(
-            "Select the number of entries to fetch",
-            min_value=1000,
-            max_value=num_ent,
-            value=2000,
-            step=100,
-        )
-        start_offset = st.slider(
-            "Select the start offset",
-            min_value=0,
-            max_value=limit,
-            value=0,
-            step=100,
-        )
+        # Slider to select the range of entries to fetch, over the chats
+        # stored so far
+        if keep_store_current() is not None:
+            wait_for_job("sync_job")
+        store = local_store.connect()
+        try:
+            num_ent = local_store.count_entries(store)
+        finally:
+            store.close()
+        if num_ent < 1000:
+            st.write(f"{num_ent} chat entries stored so far")
+            limit = num_ent
+            start_offset = 0
+        else:
+            limit = st.slider(
+                "Select the number of entries to fetch",
+                min_value=1000,
+                max_value=num_ent,
+                value=min(2000, num_ent),
+                step=100,
+            )
+            start_offset = st.slider(
+                "Select the start offset",
+                min_value=0,
+                max_value=limit,
+                value=0,
+                step=100,
+            )
         start_date = (
             None  # Disable the date range inputs for number of entries filtering
         )
@@ -163,78 +258,33 @@ with st.sidebar:
     if fetch_button:
         try:
             if filter_option == "Date Range":
-                # Handle both Monthly and Quarterly
-                start_date_obj = datetime.strptime(start_date, "%Y/%m/%d")
-                end_date_obj = datetime.strptime(end_date, "%Y/%m/%d")
-
-                start_date_str = start_date_obj.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
-                end_date_str = end_date_obj.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
-
-                query = f"SELECT c.id, c.TimeStamp, c.AssistantName, c.ChatTitle FROM c WHERE c.TimeStamp BETWEEN '{start_date_str}' AND '{end_date_str}' ORDER BY c.TimeStamp DESC"
+                # Handle both Monthly and Quarterly, converted as precompute.py
+                # does so materialized windows are found
+                range_start = to_timestamp(start_date)
+                range_end = to_timestamp(end_date)
             elif filter_option == "Custom Date Range":
                 # Use the custom date range selected by the user
-                query = f"SELECT c.id, c.TimeStamp, c.AssistantName, c.ChatTitle FROM c WHERE c.TimeStamp BETWEEN '{start_date_str}T00:00:00.000000Z' AND '{end_date_str}T23:59:59.999999Z' ORDER BY c.TimeStamp DESC"
-            elif filter_option == "Number of Entries":
-                query = f"SELECT c.id, c.TimeStamp, c.AssistantName, c.ChatTitle FROM c ORDER BY c.TimeStamp DESC OFFSET {start_offset} LIMIT {limit}"
-
-            # Query Cosmos DB
-            items = list(
-                container.query_items(query=query, enable_cross_partition_query=True)
-            )
+                range_start = f"{start_date_str}T00:00:00.000000Z"
+                range_end = f"{end_date_str}T23:59:59.999999Z"
+            else:
+                range_start = range_end = None
 
-            # Display results
-            if items:
-                st.write(f"Displaying {len(items)} chat entries:")
-                for i in range(len(items)):
-                    items[i]["ChatTitle"] = items[i]["ChatTitle"][:50]
-                st.session_state["chats"] = list(items)
-
-                chat_titles = [
-                    chat["ChatTitle"][:50] for chat in st.session_state["chats"]
-                ]
-                chat_titles_text = "\n".join(
-                    chat_titles
-                )  # Join chat titles into a single text block
-                st.session_state["topics"] = extract_topics_from_text(chat_titles_text)
-                st.session_state["processed_chat_titles"] = preprocess_text(
-                    chat_titles_text
+            submit_fetch(
+                fetch_pipeline.FetchRequest(
+                    filter_option, range_start, range_end, start_offset, limit
                 )
-
-                # Get trend analysis
-                if chat_titles:
-                    with st.spinner("Analyzing trends..."):
-                        trend_analysis_response = llmclient.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": "You are an expert data analyst analyzing trends from user interaction data.",
-                                },
-                                {
-                                    "role": "user",
-                                    "content": f"""
-                                    Analyze the following chat titles for trends, topics, and insights based on user interactions. 
-                                    Provide a summary of key trends and observations.
-                                    
-                                    Chat Titles:
-                                    {st.session_state["processed_chat_titles"]}
-                                """,
-                                },
-                            ],
-                            temperature=0.7,
-                            stream=False,  # We want a complete response, not a stream
-                        )
-                        st.session_state["trend_analysis"] = (
-                            trend_analysis_response.choices[0].message.content
-                        )
-            else:
-                st.write("No data found for the selected range.")
+            )
+            st.session_state["previous_requests"] = []
 
         except Exception as e:
             st.write(f"An error occurred: {str(e)}")
 
+    if st.session_state.get("fetch_message"):
+        st.write(st.session_state["fetch_message"])
+
     # Display filter information
     if "chats" in st.session_state and st.session_state["chats"]:
+        st.write(f"Displaying {len(st.session_state['chats'])} chat entries:")
         if filter_option == "Date Range":
             st.write(f"Data Range")
             st.write(f"From: {start_date}")
@@ -244,10 +294,83 @@ with st.sidebar:
             st.write(f"From: {start_date_str}")
             st.write(f"To: {end_date_str}")
         elif filter_option == "Number of Entries":
+            request = st.session_state.get("fetch_request")
+            if request is not None and request.filter_option == filter_option:
+                limit, start_offset = request.limit, request.start_offset
             st.write(f"Entries Fetching")
             st.write(f"Limit: {limit}")
             st.write(f"Start Offset: {start_offset}")
 
+            # Later pages continue from the fetched page's token, so they
+            # cost one index seek like the first
+            previous_requests = st.session_state["previous_requests"]
+            fetching = "job" in st.session_state
+            previous_col, next_col = st.columns(2)
+            if previous_col.button("Previous", disabled=fetching or not previous_requests):
+                submit_fetch(previous_requests.pop())
+                st.rerun()
+            next_token = st.session_state.get("next_token")
+            if next_col.button("Next", disabled=fetching or request is None or next_token is None):
+                previous_requests.append(request)
+                submit_fetch(
+                    request._replace(
+                        start_offset=request.start_offset + request.limit,
+                        continuation_token=next_token,
+                    )
+                )
+                st.rerun()
+
+    if hasattr(get_llm_client(), "stats"):
+        cache_stats = get_llm_client().stats()
+        st.caption(
+            f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['entries']} entries"
+        )
+
+def apply_fetched(fetched):
+    """Point the session at fetched chats, shared with other sessions."""
+    st.session_state["chats"] = fetched.dataset
+    st.session_state["title_groups"] = fetched.title_groups
+    st.session_state["title_index"] = fetched.title_index
+    st.session_state["aggregates"] = fetched.aggregates
+    st.session_state["next_token"] = fetched.next_token
+    st.session_state["shared_analysis"] = fetched.analysis
+    st.session_state["topics"] = fetched.analysis.get("topics", [])
+    st.session_state["trend_analysis"] = fetched.analysis.get("trend_analysis", "")
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_job():
+    """Poll the session's fetch job, streaming its progress and partial results."""
+    job = st.session_state["job"]
+    if job.done:
+        del st.session_state["job"]
+        if job.state == jobs.DONE and job.result is not None:
+            apply_fetched(job.result)
+        elif job.state == jobs.DONE:
+            st.session_state["fetch_message"] = "No data found for the selected range."
+        elif job.state == jobs.FAILED:
+            st.session_state["fetch_message"] = f"An error occurred: {job.error}"
+        st.rerun()
+
+    # Questions can be asked as soon as the chats are loaded
+    fetched = job.partial.get("fetched")
+    if fetched is not None and st.session_state["chats"] is not fetched.dataset:
+        apply_fetched(fetched)
+
+    st.progress(job.progress, text=job.message or "Waiting for a worker...")
+    if st.button("Cancel"):
+        jobs.get_runner().release(job, st.session_state["diagnostics_run"])
+        del st.session_state["job"]
+        st.rerun()
+    if job.partial.get("trend_analysis"):
+        st.write("### Trend Analysis")
+        st.markdown(job.partial["trend_analysis"])
+    if job.partial.get("topics"):
+        st.expander("Topics").write(job.partial["topics"])
+    st.write("---")
+
+
 # Display Chat View
 if st.session_state["current_view"] == "Chat":
     st.markdown(
@@ -255,12 +378,48 @@ if st.session_state["current_view"] == "Chat":
         unsafe_allow_html=True,
     )
 
+    if "job" in st.session_state:
+        show_job()
+
     # Display trend analysis if available
     if "trend_analysis" in st.session_state and st.session_state["trend_analysis"]:
         st.write("### Trend Analysis")
         st.markdown(st.session_state["trend_analysis"])
+        if st.session_state.get("topics"):
+            st.expander("Topics").write(st.session_state["topics"])
         st.write("---")
 
+    # Semantic groups from local title embeddings; no LLM call involved.
+    # Embedding and clustering run as a background job, like the fetch
+    if st.session_state["chats"]:
+        with st.expander("Semantic Groups"):
+            shared_analysis = st.session_state["shared_analysis"]
+            groups_key = ("semantic_groups", *st.session_state["chats"].timestamp_range())
+            groups_owner = (st.session_state["diagnostics_run"], "semantic_groups")
+            groups_job = st.session_state.get("groups_job")
+            if groups_job is not None and (groups_job.done or groups_job.key != groups_key):
+                # Finished, or started for chats this session no longer shows
+                del st.session_state["groups_job"]
+                if groups_job.key != groups_key:
+                    jobs.get_runner().release(groups_job, groups_owner)
+                elif groups_job.state == jobs.DONE:
+                    shared_analysis["semantic_groups"] = groups_job.result
+                elif groups_job.state == jobs.FAILED:
+                    st.write(f"An error occurred: {groups_job.error}")
+                groups_job = None
+            if "semantic_groups" in shared_analysis:
+                st.dataframe(pd.DataFrame(shared_analysis["semantic_groups"]), hide_index=True)
+            elif groups_job is not None or st.button("Group chats by meaning"):
+                if groups_job is None:
+                    st.session_state["groups_job"] = jobs.get_runner().submit(
+                        groups_key,
+                        embeddings.run_semantic_groups_job,
+                        *groups_key[1:],
+                        owner=groups_owner,
+                        description="semantic groups",
+                    )
+                wait_for_job("groups_job")
+
     # Display previous messages (for chat history)
     for message in st.session_state["messages"]:
         with st.chat_message(message["role"]):
@@ -275,21 +434,34 @@ if st.session_state["current_view"] == "Chat":
                 st.markdown(prompt)
 
             with st.spinner("Thinking..."):
-                response_stream = llmclient.chat.completions.create(
+                # Send only the titles relevant to the question plus the
+                # precomputed aggregates, along with the recent conversation
+                relevant = relevant_titles(
+                    st.session_state.get("title_index"),
+                    st.session_state.get("title_groups", []),
+                    prompt,
+                )
+                relevant_text = "\n".join(format_title_groups(relevant))
+                history = st.session_state["messages"][:-1][-HISTORY_MESSAGES:]
+                response_stream = get_llm_client().chat.completions.create(
                     model="gpt-4o",
                     messages=[
                         {
                             "role": "system",
                             "content": "You are an expert product analyst who analyses software products based on the user statistics from user database.",
                         },
+                        *history,
                         {
                             "role": "user",
                             "content": f"""
                             Answer the user's prompt based on the following data from the database. 
                             The database contains usage history of user questions and AI responses from an AI-assisted chatbot interface, specifically used for legal advice.
 
-                            User Chat Titles: 
-                            {st.session_state["processed_chat_titles"]}
+                            Aggregate statistics:
+                            {st.session_state.get("aggregates", "")}
+
+                            Chat titles most relevant to the prompt (xN = number of similar chats):
+                            {relevant_text}
                             Highlighted topics:
                             {st.session_state["topics"]}
 
@@ -330,79 +502,144 @@ elif st.session_state["current_view"] == "Analytics":
         index=2,
     )
 
-    # Define quarterly ranges
-    quarters = {
-        "Q1": (f"{selected_year}/01/01", f"{selected_year}/03/31"),
-        "Q2": (f"{selected_year}/04/01", f"{selected_year}/06/30"),
-        "Q3": (f"{selected_year}/07/01", f"{selected_year}/09/30"),
-        "Q4": (f"{selected_year}/10/01", f"{selected_year}/12/31"),
-    }
-
-    def get_top_topics(start_date, end_date):
-        start_date_obj = datetime.strptime(start_date, "%Y/%m/%d")
-        end_date_obj = datetime.strptime(end_date, "%Y/%m/%d")
-        start_date_str = start_date_obj.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
-        end_date_str = end_date_obj.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
-
-        query = f"""
-            SELECT c.ChatTitle 
-            FROM c 
-            WHERE c.TimeStamp BETWEEN '{start_date_str}' AND '{end_date_str}'
-            ORDER BY c.TimeStamp DESC
-        """
-        items = list(
-            container.query_items(query=query, enable_cross_partition_query=True)
+    # Views read what the store holds while a sync runs in the background
+    if keep_store_current() is not None:
+        wait_for_job("sync_job")
+
+    store = local_store.connect()
+    try:
+        # Display topics in 4 containers for each quarter, filled in as they finish
+        q1, q2 = st.columns(2)
+        q3, q4 = st.columns(2)
+
+        quarter_slots = {}
+        for column, quarter in zip((q1, q2, q3, q4), QUARTER_RANGES):
+            with column.container(height=500, border=True):
+                st.markdown(f"**{quarter} Topics**")
+                quarter_slots[quarter] = st.empty()
+                quarter_slots[quarter].info(f"Loading {quarter} data...")
+
+        # Chat volume and frequent titles, read from the rolling aggregates;
+        # rendered before the quarters fill in since they need no LLM calls
+        st.subheader("Chat Volume")
+        if feed_consumer is not None and feed_consumer.last_poll:
+            st.caption(
+                f"Live from the change feed, updated {int(time.time() - feed_consumer.last_poll)}s ago"
+            )
+        volume_period = st.radio("Group by:", PERIODS, horizontal=True, index=2)
+        volume = pd.DataFrame(
+            rollup_volume(
+                store,
+                f"{selected_year}-01-01T00:00:00.000000Z",
+                f"{selected_year}-12-31T23:59:59.999999Z",
+                period=volume_period,
+            ),
+            columns=["period", "assistant", "chats"],
+        )
+        if volume.empty:
+            st.write("No data available")
+        else:
+            st.bar_chart(
+                volume.pivot_table(
+                    index="period",
+                    columns="assistant",
+                    values="chats",
+                    aggfunc="sum",
+                    fill_value=0,
+                )
+            )
+            st.bar_chart(volume.groupby("assistant")["chats"].sum())
+
+        st.subheader("Most Frequent Titles")
+        st.dataframe(
+            pd.DataFrame(rolling_aggregates.top_titles(store, 20), columns=["title", "chats"]),
+            hide_index=True,
         )
-        chat_titles = "\n".join([item["ChatTitle"][:100] for item in items])
-
-        if not chat_titles.strip():
-            return "No data available"
-
-        processed_titles = preprocess_text(chat_titles)
-
-        # LLM call for top 10 topics
-        response = llmclient.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a legal domain expert extracting top 10 unique topics from user chat titles. Respond with the list only, no explanation.",
-                },
-                {
-                    "role": "user",
-                    "content": f"""
-                    From the following user chat titles, identify and list the top 10 unique topics discussed. Do not add any explanation or extra words.
-
-                    Chat Titles:
-                    {processed_titles}
-                    """,
-                },
-            ],
-            temperature=0.5,
-            stream=False,
+
+        # One topic model for the whole year, labeled once, so quarters and drift
+        # periods are described by the same comparable topics. Fitting runs as a
+        # background job; reruns only look up the memoized drift.
+        st.subheader("Topic Drift")
+        drift_period = st.radio("Granularity:", topic_drift.DRIFT_PERIODS, horizontal=True, index=1)
+        drift_slot = st.empty()
+        drift = topic_drift.peek_drift(*topic_drift.year_range(selected_year), store)
+    finally:
+        store.close()
+
+    drift_key = ("topic_drift", selected_year)
+    drift_job = st.session_state.get("drift_job")
+    drift_failed = False
+    if drift is None and drift_job is not None and drift_job.key == drift_key:
+        # A finished drift that peek_drift no longer serves is only used
+        # while it is fresh; a stale one is computed again
+        if (
+            drift_job.state == jobs.DONE
+            and time.time() - drift_job.finished <= TOPIC_DRIFT_REFRESH_INTERVAL
+        ):
+            drift = drift_job.result
+        elif drift_job.state == jobs.FAILED:
+            # The error is shown once; the next rerun submits the job again
+            drift_failed = True
+            del st.session_state["drift_job"]
+            for slot in (drift_slot, *quarter_slots.values()):
+                slot.write(f"An error occurred: {drift_job.error}")
+    if drift is None and not drift_failed:
+        if (
+            drift_job is None
+            or drift_job.key != drift_key
+            or drift_job.done
+            or drift_job.cancelled
+        ):
+            st.session_state["drift_job"] = jobs.get_runner().submit(
+                drift_key,
+                topic_drift.run_drift_job,
+                selected_year,
+                owner=(st.session_state["diagnostics_run"], "topic_drift"),
+                description=f"topic drift {selected_year}",
+            )
+        with drift_slot.container():
+            wait_for_job("drift_job")
+
+    if drift is not None:
+        for quarter, slot in quarter_slots.items():
+            quarter_start = f"{selected_year}-{QUARTER_RANGES[quarter][0].replace('/', '-')}"
+            ranked = topic_drift.top_topics(drift, "quarter", quarter_start)
+            if ranked:
+                slot.dataframe(
+                    pd.DataFrame(ranked),
+                    hide_index=True,
+                    column_config={
+                        "share": st.column_config.ProgressColumn(
+                            format="%.2f", min_value=0, max_value=1
+                        )
+                    },
+                )
+            else:
+                slot.write("No data available")
+
+        table = drift["periods"].get(drift_period)
+        if table:
+            drift_slot.area_chart(
+                pd.DataFrame(
+                    table["shares"],
+                    index=pd.to_datetime(table["starts"]),
+                    columns=[topic["label"] for topic in drift["topics"]],
+                )
+            )
+        else:
+            drift_slot.write("No data available")
+
+# Per-stage timings, RU charges and token usage of this session
+with st.expander("Diagnostics"):
+    session_events = instrumentation.events([st.session_state["diagnostics_run"]])
+    if session_events:
+        st.dataframe(pd.DataFrame(instrumentation.summarize(session_events)))
+        st.dataframe(pd.DataFrame(session_events[-200:]))
+        st.download_button(
+            "Export JSON",
+            instrumentation.export_json(session_events),
+            file_name="chatdb_diagnostics.json",
+            mime="application/json",
         )
-        return response.choices[0].message.content.strip()
-
-    # Display topics in 4 containers for each quarter
-    q1, q2 = st.columns(2)
-    q3, q4 = st.columns(2)
-
-    with q1.container(height=500, border=True):
-        st.markdown("**Q1 Topics**")
-        with st.spinner("Loading Q1 data..."):
-            st.write(get_top_topics(*quarters["Q1"]))
-
-    with q2.container(height=500, border=True):
-        st.markdown("**Q2 Topics**")
-        with st.spinner("Loading Q2 data..."):
-            st.write(get_top_topics(*quarters["Q2"]))
-
-    with q3.container(height=500, border=True):
-        st.markdown("**Q3 Topics**")
-        with st.spinner("Loading Q3 data..."):
-            st.write(get_top_topics(*quarters["Q3"]))
-
-    with q4.container(height=500, border=True):
-        st.markdown("**Q4 Topics**")
-        with st.spinner("Loading Q4 data..."):
-            st.write(get_top_topics(*quarters["Q4"]))
+    else:
+        st.write("No metrics recorded yet.")
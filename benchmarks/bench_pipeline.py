@@ -0,0 +1,124 @@
+"""
+Offline end-to-end benchmark of the fetch -> preprocess -> topics -> trends pipeline.
+
+Runs against the in-memory Cosmos container and fake LLM client from fakes.py,
+so no Azure endpoints are needed. Usage:
+
+    python benchmarks/bench_pipeline.py [--sizes 10000 100000 1000000]
+        [--page-latency 0.0] [--llm-latency 0.5] [--tokens-per-second 0]
+
+Reports per-stage wall-clock timings, simulated RU charges and token usage.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configure(args, store_dir):
+    # Must happen before the app modules read their configuration
+    os.environ["CHATDB_FAKE_CLIENTS"] = "1"
+    os.environ["LOCAL_STORE_DIR"] = store_dir
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    sys.path.insert(0, ROOT)
+
+
+def run_size(size, args):
+    import instrumentation
+    import local_store
+    from dedup import collapse_titles, format_title_groups
+    from fakes import FakeContainer, make_chat_documents
+    from preprocessor import preprocess_titles
+    from topic_engine import TopicEngine
+    from topicmodelling_dev import extract_topics_from_text
+    from trend_analysis import analyze_trends
+
+    store_dir = tempfile.mkdtemp(prefix="chatdb-bench-")
+    timings = {}
+    instrumentation.set_run(f"bench-{size}")
+
+    def stage(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    try:
+        documents = make_chat_documents(size)
+        container = FakeContainer(documents, page_latency=args.page_latency)
+        conn = local_store.connect(store_dir)
+
+        stage("sync", lambda: local_store.sync(container, conn, force=True))
+
+        def fetch():
+            titles = []
+            for page in local_store.iter_range_pages(
+                conn, "0000-01-01T00:00:00.000000Z", "9999-12-31T23:59:59.999999Z"
+            ):
+                titles.extend(item["ChatTitle"][:50] for item in page)
+            return titles
+
+        chat_titles = stage("fetch", fetch)
+        processed = stage(
+            "preprocess",
+            lambda: [title for title in preprocess_titles(chat_titles) if title],
+        )
+        groups = stage("dedup", lambda: collapse_titles(processed))
+
+        distinct_text = "\n".join(title for title, _ in groups)
+        stage(
+            "topics (NMF refit)",
+            lambda: extract_topics_from_text(distinct_text, cleaned_text=distinct_text),
+        )
+
+        engine = TopicEngine()
+        stage("topic model update", lambda: engine.update_from_store(conn))
+        stage("topics (transform)", lambda: engine.topics_for_titles(chat_titles))
+
+        stage("trend analysis", lambda: analyze_trends(format_title_groups(groups)))
+        conn.close()
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    stages = {
+        stage["stage"]: stage
+        for stage in instrumentation.summarize(instrumentation.events([f"bench-{size}"]))
+    }
+    llm = stages.get("llm_completion", {})
+    usage = {
+        "RU": container.total_request_charge,
+        "pages": container.page_count,
+        "LLM calls": llm.get("calls", 0),
+        "prompt tokens": llm.get("prompt_tokens", 0),
+        "completion tokens": llm.get("completion_tokens", 0),
+        "distinct titles": len(groups),
+    }
+    return timings, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    args = parser.parse_args()
+
+    _configure(args, tempfile.gettempdir())
+    for size in args.sizes:
+        timings, usage = run_size(size, args)
+        print(f"\n{size} titles")
+        for name, seconds in timings.items():
+            print(f"  {name:<22} {seconds:>9.3f}s")
+        print(f"  {'total':<22} {sum(timings.values()):>9.3f}s")
+        print("  " + ", ".join(f"{key}: {value:,.0f}" for key, value in usage.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of `preprocess_text` against the batch `preprocess_titles` API.
+
+Usage: python benchmarks/bench_preprocessor.py [--sizes 10000 100000 1000000] [--processes 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessor import preprocess_text, preprocess_titles
+
+WORDS = (
+    "draft review the an NDA lease agreement for of contract termination clause "
+    "employment dispute summary what is a how to tenant landlord liability "
+    "indemnity GDPR compliance policy merger & acquisition due-diligence"
+).split()
+
+
+def make_titles(count, seed=42):
+    """Generate synthetic chat titles resembling the production data."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))[:50] + rng.choice(("", "?", "!", "."))
+        for _ in range(count)
+    ]
+
+
+def _time(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(sizes, processes):
+    print(f"{'titles':>10} {'preprocess_text':>16} {'preprocess_titles':>18} {'pool':>10} {'speedup':>8}")
+    for size in sizes:
+        titles = make_titles(size)
+        joined = "\n".join(titles)
+        baseline = _time(lambda: preprocess_text(joined))
+        batch = _time(lambda: preprocess_titles(titles))
+        pooled = _time(lambda: preprocess_titles(titles, processes=processes))
+        print(
+            f"{size:>10} {baseline:>15.3f}s {batch:>17.3f}s {pooled:>9.3f}s "
+            f"{baseline / min(batch, pooled):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    run(args.sizes, args.processes)
@@ -0,0 +1,89 @@
+"""
+Measure cold import and first-use time of the analytics modules.
+
+Each module is imported in a fresh interpreter so results are not skewed by
+modules already loaded. Usage:
+
+    python benchmarks/bench_startup.py [--repeat 5] [--max-seconds 1.0]
+
+The script exits non-zero if any module fails to import or, with
+--max-seconds, if any median import time exceeds the limit, so it can guard
+against startup regressions in CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module name -> statement run after the import to include first-use cost
+TARGETS = {
+    "preprocessor": "preprocessor.preprocess_text('Draft an NDA for the client')",
+    "trend_analysis": None,
+    "topicmodelling_dev": None,
+    # Modules app.py imports before its first render
+    "cloud_config": None,
+    "local_store": None,
+    "change_feed": None,
+    "topic_drift": None,
+    "embeddings": None,
+}
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{first_use}
+used = time.perf_counter()
+print(imported - start, used - imported)
+"""
+
+
+def measure(module, first_use):
+    """Return (import seconds, first-use seconds) from a fresh interpreter."""
+    code = SNIPPET.format(module=module, first_use=first_use or "pass")
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def run(repeat, max_seconds):
+    print(f"{'module':>20} {'import':>10} {'first use':>10}")
+    slow = []
+    failed = []
+    for module, first_use in TARGETS.items():
+        try:
+            runs = [measure(module, first_use) for _ in range(repeat)]
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.strip().splitlines()
+            print(f"{module:>20} failed: {error[-1] if error else f'exit status {e.returncode}'}")
+            failed.append(module)
+            continue
+        import_time = statistics.median(r[0] for r in runs)
+        use_time = statistics.median(r[1] for r in runs)
+        print(f"{module:>20} {import_time:>9.3f}s {use_time:>9.3f}s")
+        if max_seconds is not None and import_time > max_seconds:
+            slow.append(module)
+
+    if failed:
+        print(f"Failed to import: {', '.join(failed)}")
+    if slow:
+        print(f"Import time above {max_seconds}s: {', '.join(slow)}")
+    if failed or slow:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+    run(args.repeat, args.max_seconds)
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from cloud_config import CHANGE_FEED_POLL_INTERVAL, FETCH_PAGE_SIZE, LOCAL_STORE_DIR
+import local_store
+import topic_engine
+
+# The change feed continuation is stored next to the chats it produced, so a
+# restart resumes exactly where the last committed page ended
+CHECKPOINT_KEY = local_store.CHANGE_FEED_CHECKPOINT_KEY
+
+_consumer = None
+_consumer_lock = threading.Lock()
+
+
+def consume(container, conn, page_size=FETCH_PAGE_SIZE, on_page=None):
+    """
+    Apply every pending change-feed page to the local store.
+
+    New chats are mirrored and folded into the rolling aggregates, and the
+    continuation is checkpointed in the same transaction as each page.
+    `on_page` is called with the running total after each page. Returns the
+    number of documents received.
+    """
+    continuation = local_store.get_state(conn, CHECKPOINT_KEY)
+    if continuation:
+        feed = container.query_items_change_feed(
+            max_item_count=page_size, continuation=continuation
+        )
+    else:
+        feed = container.query_items_change_feed(
+            max_item_count=page_size, start_time="Beginning"
+        )
+
+    received = 0
+    # The continuation comes from the pager: the client's last response
+    # headers are shared with every other reader in the process
+    pager = feed.by_page()
+    for page in pager:
+        items = list(page)
+        continuation = pager.continuation_token
+        if items:
+            local_store.mark_changed(conn, local_store.upsert_items(conn, items))
+            received += len(items)
+        if continuation:
+            local_store.set_state(conn, CHECKPOINT_KEY, continuation)
+        conn.commit()
+        if on_page and items:
+            on_page(received)
+    return received
+
+
+class ChangeFeedConsumer(threading.Thread):
+    """
+    Background thread polling the chat container's change feed.
+
+    Keeps the local mirror, its rolling aggregates and the persisted topic
+    model current, so dashboards can show near-real-time numbers without
+    querying Cosmos per viewer.
+    """
+
+    def __init__(
+        self,
+        container,
+        store_dir=LOCAL_STORE_DIR,
+        poll_interval=CHANGE_FEED_POLL_INTERVAL,
+        update_topics=True,
+    ):
+        super().__init__(name="chatdb-change-feed", daemon=True)
+        self.container = container
+        self.store_dir = store_dir
+        self.poll_interval = poll_interval
+        self.update_topics = update_topics
+        self.received = 0
+        # Documents received so far by the poll in progress
+        self.pending = 0
+        self.last_poll = None
+        self.last_error = None
+        self._stop_event = threading.Event()
+
+    def poll(self, conn):
+        received = consume(self.container, conn, on_page=self._on_page)
+        self.pending = 0
+        if received and self.update_topics:
+            topic_engine.update_engine(conn)
+        self.received += received
+        self.last_poll = time.time()
+        return received
+
+    def _on_page(self, received):
+        self.pending = received
+
+    def run(self):
+        conn = local_store.connect(self.store_dir)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.poll(conn)
+                    self.last_error = None
+                except Exception as e:
+                    conn.rollback()
+                    self.last_error = str(e)
+                    logging.error(f"Error consuming the change feed: {e}")
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            conn.close()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def is_current():
+    """
+    Return True if this process's consumer is running and has drained the
+    feed at least once, so the local store needs no sync of its own.
+    """
+    consumer = _consumer
+    return (
+        consumer is not None
+        and consumer.is_alive()
+        and consumer.last_poll is not None
+        and consumer.last_error is None
+    )
+
+
+def ensure_current(container, conn, force=False, on_progress=None, wait_interval=0.5):
+    """
+    Bring the local store up to date before answering from it.
+
+    Nothing is done while this process's consumer keeps the store current.
+    While it is still draining the feed for the first time, this waits for
+    it rather than pulling the whole container a second time; otherwise the
+    store is synced, see `local_store.sync`. `on_progress` is called with a
+    status message while waiting or syncing, and may raise to stop waiting.
+    Returns the number of documents synced.
+    """
+    consumer = _consumer
+    while (
+        consumer is not None
+        and consumer.is_alive()
+        and consumer.last_poll is None
+        and consumer.last_error is None
+    ):
+        if on_progress:
+            on_progress(f"Waiting for the change feed: {consumer.pending} chat entries received...")
+        time.sleep(wait_interval)
+    if is_current():
+        return 0
+
+    def on_page(pulled):
+        if on_progress:
+            on_progress(f"Synced {pulled} new chat entries...")
+
+    return local_store.sync(container, conn, force=force, on_page=on_page)
+
+
+def start_consumer(container):
+    """Start the process-wide change-feed consumer once and return it."""
+    global _consumer
+    with _consumer_lock:
+        if _consumer is None or not _consumer.is_alive():
+            _consumer = ChangeFeedConsumer(container)
+            _consumer.start()
+        return _consumer
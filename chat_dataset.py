@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict, namedtuple
+from cloud_config import DATASET_CACHE_ENTRIES
+
+
+class ChatDataset:
+    """
+    Columnar, read-only view of fetched chats.
+
+    Timestamps are a datetime64[us] array, assistant names are interned as
+    int16 codes into a tuple of categories, and titles share one string
+    buffer sliced by an offsets array. A few dozen bytes per chat instead of
+    a dict per document.
+    """
+
+    def __init__(self, timestamps, assistant_codes, assistants, title_buffer, title_offsets):
+        self.timestamps = timestamps
+        self.assistant_codes = assistant_codes
+        self.assistants = assistants
+        self.title_buffer = title_buffer
+        self.title_offsets = title_offsets
+
+    @classmethod
+    def from_columns(cls, timestamps, assistants, titles):
+        """Build a dataset from parallel lists of TimeStamp strings, assistant names and titles."""
+        import numpy as np
+
+        categories = {}
+        codes = np.fromiter(
+            (categories.setdefault(name or "Unknown", len(categories)) for name in assistants),
+            dtype=np.int16,
+            count=len(assistants),
+        )
+        offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+        np.cumsum([len(title) for title in titles], out=offsets[1:])
+        return cls(
+            np.array([timestamp.rstrip("Z") for timestamp in timestamps], dtype="datetime64[us]"),
+            codes,
+            tuple(categories),
+            "".join(titles),
+            offsets,
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def titles(self):
+        """Return all titles as a list of strings."""
+        offsets = self.title_offsets.tolist()
+        buffer = self.title_buffer
+        return [buffer[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def timestamp_range(self):
+        """Return the oldest and newest TimeStamp in the store's string format."""
+        import numpy as np
+
+        if not len(self):
+            return None, None
+        oldest, newest = np.datetime_as_string(
+            np.array([self.timestamps.min(), self.timestamps.max()]), unit="us"
+        )
+        return f"{oldest}Z", f"{newest}Z"
+
+
+# Everything a fetch produces, shared by all sessions fetching the same chats.
+# `next_token` continues "Number of Entries" fetches with the following page.
+# `analysis` is filled in with topics and trends once they are computed.
+FetchedChats = namedtuple(
+    "FetchedChats",
+    [
+        "dataset",
+        "title_groups",
+        "title_lines",
+        "distinct_titles_text",
+        "title_index",
+        "aggregates",
+        "next_token",
+        "analysis",
+    ],
+)
+
+# Process-wide LRU of fetches keyed by (normalized query, store data version)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_build_locks = {}
+
+
+def fetch_key(
+    filter_option, range_start=None, range_end=None, start_offset=None, limit=None, continuation_token=None
+):
+    """Normalize a fetch request, so equivalent selections share one entry."""
+    if filter_option == "Number of Entries":
+        return ("latest", int(start_offset), int(limit), continuation_token)
+    return ("range", range_start, range_end)
+
+
+def get_or_build(key, version, build, max_entries=DATASET_CACHE_ENTRIES):
+    """
+    Return the cached fetch for `key` at `version`, calling `build()` to
+    create it on a miss.
+
+    `version` identifies the chats the fetch covers (see
+    `local_store.range_version`), so writes outside them keep the entry.
+
+    Concurrent sessions asking for the same key wait for one build instead of
+    each fetching the chats. A build returning None (no chats) is not cached.
+    """
+    cache_key = (key, version)
+    with _cache_lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+        build_lock = _build_locks.setdefault(cache_key, threading.Lock())
+
+    with build_lock:
+        with _cache_lock:
+            if cache_key in _cache:
+                return _cache[cache_key]
+        try:
+            fetched = build()
+            if fetched is None:
+                return None
+            with _cache_lock:
+                _cache[cache_key] = fetched
+                # Older versions of the same query can never be hit again
+                for stale in [k for k in _cache if k[0] == key and k != cache_key]:
+                    del _cache[stale]
+                while len(_cache) > max_entries:
+                    _cache.popitem(last=False)
+            return fetched
+        finally:
+            with _cache_lock:
+                _build_locks.pop(cache_key, None)
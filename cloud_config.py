@@ -1,14 +1,176 @@
 import os
-from openai import AzureOpenAI
+import threading
+from instrumentation import InstrumentedLLMClient
+from llm_cache import CachedLLMClient, DiskCacheBackend, MemoryCacheBackend
 
 ENDPOINT = os.getenv("DB_ENDPOINT")
 KEY = os.getenv("DB_KEY")
 DATABASE_NAME = os.getenv("DB_NAME")
 CONTAINER_NAME = os.getenv("DB_CONTAINER_NAME")
 
-# LLM setup
-llmclient = AzureOpenAI(
-    azure_endpoint=os.getenv("LLM_ENDPOINT"),
-    api_key=os.getenv("LLM_KEY"),
-    api_version="2024-10-01-preview",
-)
+# Local mirror of the chat container
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", ".chatdb_store")
+LOCAL_STORE_SYNC_INTERVAL = int(os.getenv("LOCAL_STORE_SYNC_INTERVAL", "60"))
+
+# Background change-feed consumer keeping the mirror and its aggregates current
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "1") not in ("", "0", "false")
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "5"))
+
+# Persisted incremental topic model
+TOPIC_MODEL_DIR = os.getenv("TOPIC_MODEL_DIR", os.path.join(LOCAL_STORE_DIR, "topic_model"))
+TOPIC_MODEL_COMPONENTS = int(os.getenv("TOPIC_MODEL_COMPONENTS", "20"))
+TOPIC_MODEL_FEATURES = int(os.getenv("TOPIC_MODEL_FEATURES", str(2**16)))
+
+# Topics fitted once per year for the Analytics drift charts
+TOPIC_DRIFT_COMPONENTS = int(os.getenv("TOPIC_DRIFT_COMPONENTS", "10"))
+TOPIC_DRIFT_CACHE_ENTRIES = int(os.getenv("TOPIC_DRIFT_CACHE_ENTRIES", "8"))
+# Ranges still receiving chats are refit at most this often (seconds)
+TOPIC_DRIFT_REFRESH_INTERVAL = float(os.getenv("TOPIC_DRIFT_REFRESH_INTERVAL", "3600"))
+
+# Local CPU sentence embeddings of chat titles, clustered into semantic groups
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 keeps the torch default
+EMBEDDING_CLUSTERS = int(os.getenv("EMBEDDING_CLUSTERS", "12"))
+
+# Number of documents requested per Cosmos/local store page
+FETCH_PAGE_SIZE = int(os.getenv("FETCH_PAGE_SIZE", "1000"))
+
+# Fetched datasets cached process-wide, shared by all sessions
+DATASET_CACHE_ENTRIES = int(os.getenv("DATASET_CACHE_ENTRIES", "8"))
+
+# Background jobs running fetch and analysis, and how often the app polls them
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+# Feed ranges of the chat container read concurrently by large queries (1 reads serially)
+COSMOS_READ_PARALLELISM = int(os.getenv("COSMOS_READ_PARALLELISM", "4"))
+
+# Map-reduce trend analysis limits
+TREND_CHUNK_TOKENS = int(os.getenv("TREND_CHUNK_TOKENS", "20000"))
+TREND_MAX_PARALLEL = int(os.getenv("TREND_MAX_PARALLEL", "4"))
+TREND_MAX_CHUNKS = int(os.getenv("TREND_MAX_CHUNKS", "32"))
+
+# LLM response cache: "disk", "memory" or "none"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "disk")
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(LOCAL_STORE_DIR, "llm_cache"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Offline mode: in-memory stand-ins for Cosmos and Azure OpenAI (see fakes.py)
+FAKE_CLIENTS = os.getenv("CHATDB_FAKE_CLIENTS", "") not in ("", "0", "false")
+FAKE_CHAT_COUNT = int(os.getenv("FAKE_CHAT_COUNT", "10000"))
+FAKE_PAGE_LATENCY = float(os.getenv("FAKE_PAGE_LATENCY", "0"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+
+
+# Connection pools of the shared clients
+COSMOS_POOL_SIZE = int(os.getenv("COSMOS_POOL_SIZE", "16"))
+# Hosts keeping a pool each: the account's global and regional endpoints
+COSMOS_POOL_HOSTS = int(os.getenv("COSMOS_POOL_HOSTS", "4"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+
+LLM_API_VERSION = "2024-10-01-preview"
+
+# Clients are created once per process and shared by every Streamlit session
+# and rerun, so their connection pools stay warm. Concurrent stages (feed
+# range readers, trend chunks, jobs) run on threads over these clients and
+# share their pools; there are no async (azure.cosmos.aio, AsyncAzureOpenAI)
+# variants.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(name, factory):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def _create_container():
+    if FAKE_CLIENTS:
+        from fakes import FakeContainer, make_chat_documents
+
+        return FakeContainer(
+            make_chat_documents(FAKE_CHAT_COUNT), page_latency=FAKE_PAGE_LATENCY
+        )
+
+    import requests
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.cosmos import CosmosClient
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=COSMOS_POOL_HOSTS, pool_maxsize=COSMOS_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    client = CosmosClient(
+        ENDPOINT, KEY, transport=RequestsTransport(session=session, session_owner=False)
+    )
+    database = client.get_database_client(DATABASE_NAME)
+    return database.get_container_client(CONTAINER_NAME)
+
+
+def _create_llm_client():
+    if FAKE_CLIENTS:
+        from fakes import FakeLLMClient
+
+        client = FakeLLMClient(
+            latency=FAKE_LLM_LATENCY, tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND
+        )
+    else:
+        import httpx
+        from openai import AzureOpenAI, DefaultHttpxClient
+
+        client = AzureOpenAI(
+            azure_endpoint=os.getenv("LLM_ENDPOINT"),
+            api_key=os.getenv("LLM_KEY"),
+            api_version=LLM_API_VERSION,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_POOL_SIZE,
+                    max_keepalive_connections=LLM_POOL_SIZE,
+                    keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+                )
+            ),
+        )
+    if LLM_CACHE_BACKEND == "disk":
+        client = CachedLLMClient(
+            client,
+            DiskCacheBackend(LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES),
+        )
+    elif LLM_CACHE_BACKEND == "memory":
+        client = CachedLLMClient(
+            client, MemoryCacheBackend(LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES)
+        )
+    # Outermost, so latency is measured as callers see it, cache hits included
+    return InstrumentedLLMClient(client)
+
+
+def get_container():
+    """Return the shared chat container client, or an in-memory stand-in in offline mode."""
+    return _shared("container", _create_container)
+
+
+def get_llm_client():
+    """Return the shared chat completions client."""
+    return _shared("llm", _create_llm_client)
+
+
+def _create_encoder():
+    if FAKE_CLIENTS:
+        from fakes import FakeEncoder
+
+        return FakeEncoder()
+
+    from embeddings import TitleEncoder
+
+    return TitleEncoder()
+
+
+def get_encoder():
+    """Return the shared title embedding model, loaded on first use."""
+    return _shared("encoder", _create_encoder)
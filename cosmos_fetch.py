@@ -0,0 +1,129 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cloud_config import COSMOS_READ_PARALLELISM, FETCH_PAGE_SIZE
+from instrumentation import instrument_pages, submit
+
+# Marks a feed range reader as finished on the shared page queue
+_DONE = object()
+
+
+def _page_headers():
+    """
+    Return a dict holding the response headers of a query's latest page and
+    the `response_hook` filling it.
+
+    The client's `last_response_headers` are shared by every query on the
+    connection, so concurrent readers would see each other's charges.
+    """
+    headers = {}
+
+    def response_hook(response_headers, result):
+        headers.clear()
+        headers.update(response_headers)
+
+    return headers, response_hook
+
+
+def iter_query_pages(
+    container,
+    query,
+    parameters=None,
+    page_size=FETCH_PAGE_SIZE,
+    continuation_token=None,
+    stage="cosmos_query",
+):
+    """
+    Run a cross-partition query one page at a time.
+
+    Yields (items, continuation_token) for every page, so callers can process
+    results as they arrive and resume later from the returned token. The RU
+    charge and latency of every page are recorded under `stage`.
+    """
+    headers, response_hook = _page_headers()
+    pager = container.query_items(
+        query=query,
+        parameters=parameters,
+        enable_cross_partition_query=True,
+        max_item_count=page_size,
+        response_hook=response_hook,
+    ).by_page(continuation_token)
+
+    pages = ((list(page), pager.continuation_token) for page in pager)
+    yield from instrument_pages(container, pages, stage, headers)
+
+
+def _put(pages, item, stop):
+    """Queue an item unless the consumer has stopped; returns False if it has."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_feed_range(container, query, parameters, page_size, feed_range, pages, stop, stage):
+    headers, response_hook = _page_headers()
+    pager = container.query_items(
+        query=query,
+        parameters=parameters,
+        feed_range=feed_range,
+        max_item_count=page_size,
+        response_hook=response_hook,
+    ).by_page()
+    pages_read = ((list(page), None) for page in pager)
+    for page, _ in instrument_pages(container, pages_read, stage, headers):
+        if not _put(pages, page, stop):
+            return
+
+
+def iter_query_pages_parallel(
+    container,
+    query,
+    parameters=None,
+    page_size=FETCH_PAGE_SIZE,
+    max_workers=COSMOS_READ_PARALLELISM,
+    stage="cosmos_query",
+):
+    """
+    Run a query over the container's feed ranges concurrently.
+
+    Pages are yielded as (items, None) in arrival order, interleaving the
+    ranges, so the query must not rely on ORDER BY. Falls back to
+    `iter_query_pages` for a single range or `max_workers` of 1. At most a
+    couple of pages per reader are buffered.
+    """
+    feed_ranges = list(container.read_feed_ranges()) if max_workers > 1 else []
+    if len(feed_ranges) <= 1:
+        yield from iter_query_pages(container, query, parameters, page_size, stage=stage)
+        return
+
+    pages = queue.Queue(maxsize=2 * max_workers)
+    stop = threading.Event()
+
+    def read(feed_range):
+        try:
+            _read_feed_range(
+                container, query, parameters, page_size, feed_range, pages, stop, stage
+            )
+        finally:
+            _put(pages, _DONE, stop)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(feed_ranges))) as executor:
+        futures = [submit(executor, read, feed_range) for feed_range in feed_ranges]
+        try:
+            remaining = len(futures)
+            while remaining:
+                page = pages.get()
+                if page is _DONE:
+                    remaining -= 1
+                    continue
+                yield page, None
+            for future in futures:
+                # Surface errors of readers that ended early
+                future.result()
+        finally:
+            # Readers waiting on a full queue give up once this is set
+            stop.set()
@@ -0,0 +1,130 @@
+import zlib
+from collections import Counter, defaultdict
+
+# 64 MinHash permutations in 16 bands of 4 rows: titles with a character
+# 3-gram Jaccard similarity around 0.5 or more are likely to share a bucket,
+# and candidates are then merged if their estimated similarity reaches the
+# threshold.
+NUM_PERM = 64
+BANDS = 16
+SIMILARITY_THRESHOLD = 0.7
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _shingles(text, size=3):
+    text = f" {text} "
+    if len(text) <= size:
+        return {text}
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def _signatures(texts, num_perm, seed=1):
+    import numpy as np
+
+    # Coefficients below 2**31 keep (a * h + b) within uint64 for 32-bit h
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+    prime = np.uint64(_MERSENNE_PRIME)
+
+    # Hash every shingle of every text into one flat array, then take the
+    # per-text minimum of each permutation with reduceat, a block at a time
+    shingle_hashes = []
+    offsets = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        offsets[i] = len(shingle_hashes)
+        shingle_hashes.extend(zlib.crc32(shingle.encode("utf-8")) for shingle in _shingles(text))
+    hashes = np.array(shingle_hashes, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    block = 4096
+    for start in range(0, len(texts), block):
+        stop = min(start + block, len(texts))
+        low = offsets[start]
+        high = offsets[stop] if stop < len(texts) else len(hashes)
+        permuted = (np.outer(hashes[low:high], a) + b) % prime
+        signatures[start:stop] = np.minimum.reduceat(permuted, offsets[start:stop] - low, axis=0)
+    return signatures
+
+
+def cluster_near_duplicates(
+    texts, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=BANDS
+):
+    """
+    Group near-duplicate strings with MinHash locality-sensitive hashing.
+
+    Strings are visited in order and each joins the most similar earlier
+    cluster seed it shares an LSH bucket with, or else starts a new cluster.
+    Only seeds in shared buckets are compared, so the cost stays roughly
+    linear in the number of strings, and every member is within `threshold`
+    of its seed, so chains of slightly different titles do not merge. Pass
+    the most frequent strings first to make them the seeds. Returns the index
+    of its cluster seed for every string.
+    """
+    if not texts:
+        return []
+
+    rows = num_perm // bands
+    signatures = _signatures(texts, num_perm)
+    seed_buckets = [defaultdict(list) for _ in range(bands)]
+    clusters = []
+
+    for i in range(len(texts)):
+        keys = [signatures[i, band * rows : (band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = list(
+            {seed for band, key in enumerate(keys) for seed in seed_buckets[band].get(key, ())}
+        )
+
+        best_seed = None
+        if candidates:
+            similarities = (signatures[candidates] == signatures[i]).mean(axis=1)
+            best = similarities.argmax()
+            if similarities[best] >= threshold:
+                best_seed = candidates[best]
+
+        if best_seed is None:
+            best_seed = i
+            for band, key in enumerate(keys):
+                seed_buckets[band][key].append(i)
+        clusters.append(best_seed)
+
+    return clusters
+
+
+def collapse_titles(titles, threshold=SIMILARITY_THRESHOLD):
+    """
+    Collapse near-duplicate titles into representatives with counts.
+
+    Titles are first grouped by their lowercased words without stopwords,
+    so "Draft NDA" and "draft an NDA" share a form, then the distinct forms
+    are clustered with MinHash/LSH, most frequent first. Each group is
+    represented by its most frequent original title. Returns a list of
+    (title, count) pairs, most frequent first.
+    """
+    from preprocessor import get_stop_words
+
+    stop_words = get_stop_words()
+    originals = defaultdict(Counter)
+    for title in titles:
+        words = title.lower().split()
+        key = " ".join(word for word in words if word not in stop_words) or " ".join(words)
+        if key:
+            originals[key][title] += 1
+    if not originals:
+        return []
+
+    keys = sorted(originals, key=lambda key: sum(originals[key].values()), reverse=True)
+    groups = defaultdict(Counter)
+    for key, cluster in zip(keys, cluster_near_duplicates(keys, threshold)):
+        groups[cluster].update(originals[key])
+
+    collapsed = [
+        (group.most_common(1)[0][0], sum(group.values())) for group in groups.values()
+    ]
+    collapsed.sort(key=lambda item: item[1], reverse=True)
+    return collapsed
+
+
+def format_title_groups(groups):
+    """Render (title, count) pairs as prompt lines, e.g. "Draft NDA (x12)"."""
+    return [title if count == 1 else f"{title} (x{count})" for title, count in groups]
@@ -0,0 +1,304 @@
+import logging
+import os
+import threading
+from cloud_config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CLUSTERS,
+    EMBEDDING_MODEL,
+    EMBEDDING_THREADS,
+    FETCH_PAGE_SIZE,
+    get_encoder,
+)
+from instrumentation import measure
+from rolling_aggregates import normalize_title
+import local_store
+
+# Embeddings live in a float32 matrix memory-mapped next to the local store.
+# Identical titles share one row, and every chat id points at the row of its
+# title, so each distinct title is encoded once.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedded_titles (
+    title TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_embeddings (
+    id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+"""
+
+EMBEDDINGS_FILENAME = "embeddings.f32"
+_MODEL_KEY = "embedding_model"
+
+# Row allocation and file growth are not safe across threads
+_embed_lock = threading.Lock()
+
+
+class TitleEncoder:
+    """
+    Sentence embedding model run on the CPU.
+
+    Titles are tokenized and encoded in batches, mean-pooled over their
+    tokens and L2-normalized, so dot products are cosine similarities.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, threads=EMBEDDING_THREADS):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+
+    def encode(self, titles, batch_size=EMBEDDING_BATCH_SIZE):
+        """Return the (n_titles, dim) float32 embeddings of the titles."""
+        import numpy as np
+        import torch
+
+        vectors = np.empty((len(titles), self.dim), dtype=np.float32)
+        # Batch titles of similar length together to keep padding small
+        order = np.argsort([len(title) for title in titles], kind="stable")
+        with torch.inference_mode():
+            for i in range(0, len(order), batch_size):
+                batch_ind = order[i : i + batch_size]
+                batch = self.tokenizer(
+                    [titles[j] for j in batch_ind],
+                    padding=True,
+                    truncation=True,
+                    max_length=64,
+                    return_tensors="pt",
+                )
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors[batch_ind] = torch.nn.functional.normalize(pooled, dim=1).numpy()
+        return vectors
+
+
+class EmbeddingStore:
+    """Memory-mapped embedding matrix that grows by doubling its capacity."""
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self.vectors = None
+        self.capacity = 0
+
+    def _reserve(self, rows):
+        import numpy as np
+
+        row_bytes = self.dim * np.dtype(np.float32).itemsize
+        if self.vectors is None and os.path.exists(self.path):
+            self.capacity = os.path.getsize(self.path) // row_bytes
+        if rows <= self.capacity and self.vectors is not None:
+            return
+        capacity = max(self.capacity, 1024)
+        while capacity < rows:
+            capacity *= 2
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def write(self, start_row, vectors):
+        self._reserve(start_row + len(vectors))
+        self.vectors[start_row : start_row + len(vectors)] = vectors
+        self.vectors.flush()
+
+    def read(self, rows):
+        """Return the embeddings stored at `rows` as an in-memory array."""
+        import numpy as np
+
+        self._reserve(int(np.max(rows, initial=-1)) + 1)
+        return np.asarray(self.vectors[rows])
+
+    def clear(self):
+        self.vectors = None
+        self.capacity = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _open_store(conn, encoder):
+    """Open the embedding store of a local store, resetting it if the model changed."""
+    import local_store
+
+    conn.executescript(SCHEMA)
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    store = EmbeddingStore(os.path.join(os.path.dirname(db_path), EMBEDDINGS_FILENAME), encoder.dim)
+    model = f"{encoder.name}:{encoder.dim}"
+    if local_store.get_state(conn, _MODEL_KEY) != model:
+        conn.execute("DELETE FROM embedded_titles")
+        conn.execute("DELETE FROM chat_embeddings")
+        local_store.set_state(conn, _MODEL_KEY, model)
+        conn.commit()
+        store.clear()
+    return store
+
+
+def _known_rows(conn, titles):
+    known = {}
+    for i in range(0, len(titles), 500):
+        batch = titles[i : i + 500]
+        placeholders = ",".join("?" * len(batch))
+        known.update(
+            conn.execute(
+                f"SELECT title, row FROM embedded_titles WHERE title IN ({placeholders})", batch
+            ).fetchall()
+        )
+    return known
+
+
+def embed_chats(
+    conn, start_date_str=None, end_date_str=None, encoder=None, page_size=FETCH_PAGE_SIZE, on_page=None
+):
+    """
+    Embed every chat, optionally limited to a TimeStamp range, not embedded yet.
+
+    Only titles never seen before are encoded. Each page is committed, then
+    `on_page` is called with the number of titles encoded so far and may
+    raise to stop. Returns the number of titles encoded.
+    """
+    encoder = encoder or get_encoder()
+    encoded = 0
+    with _embed_lock:
+        store = _open_store(conn, encoder)
+        next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM embedded_titles").fetchone()[0]
+        query = """
+            SELECT c.rowid, c.id, c.ChatTitle
+            FROM chats c
+            LEFT JOIN chat_embeddings e ON e.id = c.id
+            WHERE e.id IS NULL AND c.rowid > ?
+        """
+        params = ()
+        if start_date_str is not None and end_date_str is not None:
+            query += " AND c.TimeStamp BETWEEN ? AND ?"
+            params = (start_date_str, end_date_str)
+        query += " ORDER BY c.rowid LIMIT ?"
+
+        last_rowid = 0
+        while True:
+            rows = conn.execute(query, (last_rowid, *params, page_size)).fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+
+            titles = [normalize_title(row[2]) for row in rows]
+            known = _known_rows(conn, list(set(titles)))
+            new_titles = [title for title in dict.fromkeys(titles) if title not in known]
+            if new_titles:
+                with measure("embed_titles", titles=len(new_titles)):
+                    store.write(next_row, encoder.encode(new_titles))
+                new_rows = dict(zip(new_titles, range(next_row, next_row + len(new_titles))))
+                conn.executemany(
+                    "INSERT INTO embedded_titles (title, row) VALUES (?, ?)", new_rows.items()
+                )
+                known.update(new_rows)
+                next_row += len(new_titles)
+                encoded += len(new_titles)
+            conn.executemany(
+                "INSERT OR REPLACE INTO chat_embeddings (id, row) VALUES (?, ?)",
+                ((row[1], known[title]) for row, title in zip(rows, titles)),
+            )
+            conn.commit()
+            if on_page:
+                on_page(encoded)
+
+    if encoded:
+        logging.info(f"Embedded {encoded} new chat titles")
+    return encoded
+
+
+def semantic_groups(
+    conn,
+    start_date_str,
+    end_date_str,
+    n_clusters=EMBEDDING_CLUSTERS,
+    examples=5,
+    encoder=None,
+    on_stage=None,
+):
+    """
+    Cluster the chats of a TimeStamp range by the meaning of their titles.
+
+    Chats are embedded first if needed; distinct titles are clustered with
+    MiniBatchKMeans, weighted by how many chats share them. Returns a list of
+    dicts with "group", "chats", "share" and the "titles" closest to the
+    group's centroid, largest group first. `on_stage` is called as
+    `on_stage(stage, progress, message)` while embedding and before
+    clustering, see `topic_drift.compute_drift`.
+    """
+    import numpy as np
+    from sklearn.cluster import MiniBatchKMeans
+
+    def stage(name, progress, message):
+        if on_stage:
+            on_stage(name, progress, message)
+
+    encoder = encoder or get_encoder()
+    stage("embed", 0.0, "Embedding chat titles...")
+    embed_chats(
+        conn,
+        start_date_str,
+        end_date_str,
+        encoder,
+        on_page=lambda encoded: stage("embed", 0.0, f"Embedded {encoded} new chat titles..."),
+    )
+    rows = conn.execute(
+        """
+        SELECT e.row, c.ChatTitle
+        FROM chats c
+        JOIN chat_embeddings e ON e.id = c.id
+        WHERE c.TimeStamp BETWEEN ? AND ?
+        """,
+        (start_date_str, end_date_str),
+    ).fetchall()
+    if not rows:
+        return []
+
+    embedding_rows, first, counts = np.unique(
+        np.array([row[0] for row in rows], dtype=np.int64), return_index=True, return_counts=True
+    )
+    titles = [rows[i][1] for i in first]
+    with _embed_lock:
+        vectors = _open_store(conn, encoder).read(embedding_rows)
+
+    stage("cluster", 0.8, f"Clustering {len(embedding_rows)} distinct titles...")
+    kmeans = MiniBatchKMeans(
+        n_clusters=min(n_clusters, len(embedding_rows)),
+        batch_size=1024,
+        n_init=3,
+        random_state=42,
+    )
+    with measure("kmeans_fit", titles=len(embedding_rows)):
+        labels = kmeans.fit_predict(vectors, sample_weight=counts)
+    distances = np.linalg.norm(vectors - kmeans.cluster_centers_[labels], axis=1)
+    chats = np.bincount(labels, weights=counts, minlength=kmeans.n_clusters)
+
+    groups = []
+    for cluster in np.argsort(chats)[::-1]:
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        closest = members[np.argsort(distances[members])[:examples]]
+        groups.append(
+            {
+                "group": len(groups) + 1,
+                "chats": int(chats[cluster]),
+                "share": float(chats[cluster] / counts.sum()),
+                "titles": [titles[i] for i in closest],
+            }
+        )
+    return groups
+
+
+def run_semantic_groups_job(job, start_date_str, end_date_str):
+    """Job grouping the chats of a TimeStamp range by meaning, stopping between stages once cancelled."""
+    store = local_store.connect()
+    try:
+        return semantic_groups(store, start_date_str, end_date_str, on_stage=job.update)
+    finally:
+        store.close()
@@ -0,0 +1,338 @@
+"""
+In-memory stand-ins for the Cosmos chat container, the Azure OpenAI client and
+the title embedding model.
+
+They let the app and the benchmarks run offline with synthetic data while
+simulating request latency, RU charges and token usage. Enable them for the
+app with CHATDB_FAKE_CLIENTS=1 (see cloud_config).
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ASSISTANTS = ("LegalAssist", "ContractBot", "ComplianceGPT", "LitigationHelper")
+
+TITLE_TEMPLATES = (
+    "Draft {doc} for {party}",
+    "draft an {doc}",
+    "Review {doc} termination clause",
+    "Summarize {doc} obligations",
+    "What is a {doc}?",
+    "{party} dispute over {doc}",
+    "GDPR compliance for {party}",
+    "Liability cap in {doc}",
+    "Employment law question about {party}",
+    "Indemnity clause in {doc} with {party}",
+)
+DOCUMENTS = ("NDA", "lease agreement", "SaaS contract", "employment contract", "MSA", "SOW", "privacy policy", "share purchase agreement")
+PARTIES = ("tenant", "landlord", "employee", "supplier", "customer", "contractor", "startup", "bank")
+
+
+def make_chat_documents(count, start=datetime(2023, 1, 1), days=3 * 365, seed=42):
+    """Generate `count` synthetic chat documents spread over `days` days."""
+    rng = random.Random(seed)
+    span = days * 24 * 3600
+    documents = []
+    for i in range(count):
+        timestamp = start + timedelta(seconds=rng.randrange(span), microseconds=rng.randrange(1_000_000))
+        title = rng.choice(TITLE_TEMPLATES).format(doc=rng.choice(DOCUMENTS), party=rng.choice(PARTIES))
+        documents.append(
+            {
+                "id": f"chat-{i:08d}",
+                "TimeStamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "AssistantName": rng.choice(ASSISTANTS),
+                "ChatTitle": title,
+                "UserId": f"user-{rng.randrange(500)}",
+            }
+        )
+    return documents
+
+
+class FakeItemPaged:
+    """Mimics azure.core.paging.ItemPaged for a precomputed result list."""
+
+    def __init__(self, container, results, page_size, feed_position=None, response_hook=None):
+        self._container = container
+        self._results = results
+        self._page_size = page_size or 100
+        # Set for change-feed reads: the feed position results start after
+        self._feed_position = feed_position
+        self._response_hook = response_hook
+        self.continuation_token = None
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token=None):
+        return _FakePager(self, int(continuation_token or 0))
+
+
+class _FakePager:
+    def __init__(self, paged, position):
+        self._paged = paged
+        self._position = position
+        self.continuation_token = None
+
+    def __iter__(self):
+        results = self._paged._results
+        page_size = self._paged._page_size
+        while self._position < len(results):
+            page = results[self._position : self._position + page_size]
+            self._position += len(page)
+            self.continuation_token = (
+                str(self._position) if self._position < len(results) else None
+            )
+            etag = None
+            if self._paged._feed_position is not None:
+                # Change-feed continuations are feed positions and never run out
+                etag = self.continuation_token = str(self._paged._feed_position + self._position)
+            self._paged._container._charge(page, etag, self._paged._response_hook)
+            yield iter(page)
+
+
+class FakeContainer:
+    """
+    In-memory Cosmos container supporting the queries this app issues.
+
+    Supports TimeStamp range filters (BETWEEN/>=/>/</<= with literals or
+    parameters), ORDER BY c.TimeStamp, OFFSET/LIMIT and SELECT VALUE COUNT.
+    Every page sleeps
+    for `page_latency` seconds and is charged RUs like a real query: a base
+    charge plus a per-document charge. The charge of the last page is exposed
+    in `client_connection.last_response_headers` and passed to a query's
+    `response_hook` with the page, as the SDK does. Documents
+    are hashed by id into `partitions` feed ranges, which queries can be
+    scoped to with `feed_range`. The change feed lists documents in the
+    order they were added, with the feed position as continuation (etag);
+    `add_documents` simulates new chats landing.
+    """
+
+    def __init__(
+        self, documents, page_latency=0.0, base_charge=2.8, charge_per_item=0.05, partitions=4
+    ):
+        self.documents = sorted(documents, key=lambda doc: doc["TimeStamp"])
+        self.feed = list(documents)
+        self.partitions = partitions
+        self.page_latency = page_latency
+        self.base_charge = base_charge
+        self.charge_per_item = charge_per_item
+        self.total_request_charge = 0.0
+        self.page_count = 0
+        self.client_connection = SimpleNamespace(last_response_headers={})
+        self._lock = threading.Lock()
+
+    def _charge(self, page, etag=None, response_hook=None):
+        if self.page_latency:
+            time.sleep(self.page_latency)
+        charge = self.base_charge + self.charge_per_item * len(page)
+        headers = {
+            "x-ms-request-charge": f"{charge:.2f}",
+            "x-ms-item-count": str(len(page)),
+        }
+        if etag is not None:
+            headers["etag"] = etag
+        with self._lock:
+            self.total_request_charge += charge
+            self.page_count += 1
+            self.client_connection.last_response_headers = dict(headers)
+        if response_hook is not None:
+            response_hook(headers, page)
+
+    def add_documents(self, documents):
+        """Add new documents, as if chats were written to the container."""
+        with self._lock:
+            self.feed.extend(documents)
+            self.documents = sorted(
+                self.documents + list(documents), key=lambda doc: doc["TimeStamp"]
+            )
+
+    def query_items_change_feed(
+        self, max_item_count=None, start_time=None, continuation=None, **kwargs
+    ):
+        if continuation is not None:
+            position = int(continuation)
+        elif start_time == "Beginning":
+            position = 0
+        else:
+            position = len(self.feed)
+        return FakeItemPaged(
+            self, self.feed[position:], max_item_count, feed_position=position
+        )
+
+    def read_feed_ranges(self, force_refresh=False, **kwargs):
+        return [{"fakePartition": i} for i in range(self.partitions)]
+
+    def _partition(self, document):
+        return zlib.crc32(document["id"].encode("utf-8")) % self.partitions
+
+    def query_items(
+        self,
+        query,
+        parameters=None,
+        enable_cross_partition_query=False,
+        max_item_count=None,
+        feed_range=None,
+        response_hook=None,
+        **kwargs,
+    ):
+        values = {param["name"]: param["value"] for param in parameters or []}
+        documents = self.documents
+        if feed_range is not None:
+            documents = [
+                doc for doc in documents if self._partition(doc) == feed_range["fakePartition"]
+            ]
+        results = self._run(" ".join(query.split()), values, documents)
+        return FakeItemPaged(self, results, max_item_count, response_hook=response_hook)
+
+    def _value(self, token, values):
+        token = token.strip()
+        if token.startswith("@"):
+            return values[token]
+        return token.strip("'\"")
+
+    def _run(self, query, values, documents):
+
+        between = re.search(r"c\.TimeStamp BETWEEN (\S+) AND (\S+)", query)
+        if between:
+            low, high = self._value(between.group(1), values), self._value(between.group(2), values)
+            documents = [doc for doc in documents if low <= doc["TimeStamp"] <= high]
+        for op, value in re.findall(r"c\.TimeStamp (>=|<=|>|<) (\S+)", query):
+            bound = self._value(value, values)
+            compare = {
+                ">=": lambda ts: ts >= bound,
+                ">": lambda ts: ts > bound,
+                "<=": lambda ts: ts <= bound,
+                "<": lambda ts: ts < bound,
+            }[op]
+            documents = [doc for doc in documents if compare(doc["TimeStamp"])]
+
+        if re.search(r"SELECT VALUE COUNT\(", query):
+            return [len(documents)]
+
+        if re.search(r"ORDER BY c\.TimeStamp DESC", query):
+            documents = documents[::-1]
+        paging = re.search(r"OFFSET (\d+) LIMIT (\d+)", query)
+        if paging:
+            offset, limit = int(paging.group(1)), int(paging.group(2))
+            documents = documents[offset : offset + limit]
+
+        fields = re.findall(r"c\.(\w+)", query.split(" FROM ")[0])
+        return [{field: doc.get(field) for field in fields} for doc in documents]
+
+
+class FakeChatCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, messages, temperature=None, stream=False, **kwargs):
+        return self._client._complete(model, messages, stream)
+
+
+class FakeLLMClient:
+    """
+    Stand-in for AzureOpenAI chat completions.
+
+    Each call waits `latency` seconds before the first token and then
+    `completion_tokens / tokens_per_second` seconds for the rest. Prompt tokens
+    are estimated at four characters per token. Responses carry a `usage`
+    block like the real API; streamed responses send it with the last chunk.
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, completion_tokens=200):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.total_completion_tokens = 0
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(self))
+        self._lock = threading.Lock()
+
+    def _content(self, messages):
+        prompt = messages[-1]["content"]
+        if "JSON" in prompt:
+            return json.dumps(
+                [
+                    {"label": "Contract drafting", "description": "Requests to draft or review contracts."},
+                    {"label": "Compliance", "description": "Questions about regulatory compliance."},
+                ]
+            )
+        words = " ".join(["insight"] * max(self.completion_tokens - 5, 1))
+        return f"Key trends across {len(prompt.splitlines())} lines: {words}"
+
+    def _usage(self, prompt_tokens):
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            total_tokens=prompt_tokens + self.completion_tokens,
+        )
+
+    def _complete(self, model, messages, stream):
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4 + 1
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.total_completion_tokens += self.completion_tokens
+
+        content = self._content(messages)
+        generation_time = (
+            self.completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        )
+        if not stream:
+            time.sleep(self.latency + generation_time)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=self._usage(prompt_tokens),
+                model=model,
+            )
+        return self._stream(content, prompt_tokens, generation_time)
+
+    def _stream(self, content, prompt_tokens, generation_time):
+        time.sleep(self.latency)
+        pieces = content.split(" ")
+        delay = generation_time / len(pieces)
+        for i, piece in enumerate(pieces):
+            if delay:
+                time.sleep(delay)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=piece if i == 0 else " " + piece))],
+                usage=None,
+            )
+        yield SimpleNamespace(choices=[], usage=self._usage(prompt_tokens))
+
+
+class FakeEncoder:
+    """
+    Title embedding model stand-in: a sum of fixed random word vectors, so
+    titles sharing words land close together.
+    """
+
+    name = "fake-encoder"
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self._word_vectors = {}
+
+    def _word_vector(self, word):
+        import numpy as np
+
+        if word not in self._word_vectors:
+            rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+            self._word_vectors[word] = rng.standard_normal(self.dim).astype(np.float32)
+        return self._word_vectors[word]
+
+    def encode(self, titles, batch_size=None):
+        import numpy as np
+
+        vectors = np.zeros((len(titles), self.dim), dtype=np.float32)
+        for i, title in enumerate(titles):
+            for word in re.findall(r"\w+", title.lower()):
+                vectors[i] += self._word_vector(word)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
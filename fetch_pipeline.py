@@ -0,0 +1,189 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from cloud_config import get_container
+from chat_dataset import ChatDataset, FetchedChats
+from dedup import collapse_titles, format_title_groups
+from preprocessor import preprocess_titles
+from retrieval import build_aggregates, build_index
+from topic_engine import extract_window_topics
+from trend_analysis import stream_trends
+import change_feed
+import chat_dataset
+import instrumentation
+import local_store
+import results_store
+
+# A fetch as selected in the sidebar; range_* are None for "Number of Entries",
+# whose pages after the first continue from the previous page's token
+FetchRequest = namedtuple(
+    "FetchRequest",
+    ["filter_option", "range_start", "range_end", "start_offset", "limit", "continuation_token"],
+    defaults=[None],
+)
+
+# Share of the job's progress bar given to each stage
+_SYNC_PROGRESS = 0.1
+_LOAD_PROGRESS = 0.6
+
+
+def job_key(request):
+    """Key identical fetches alike, so they join one in-flight job."""
+    return ("fetch", chat_dataset.fetch_key(*request))
+
+
+def fetch_version(store, request):
+    """
+    Return the version of the chats a request covers.
+
+    A range is versioned on its own chats, so syncs adding chats elsewhere
+    keep its cached fetch. The latest entries shift with any new chat, so
+    they are versioned on the whole mirror.
+    """
+    if request.filter_option == "Number of Entries":
+        return local_store.range_version(store)
+    return local_store.range_version(store, request.range_start, request.range_end)
+
+
+def load_chats(job, store, request):
+    """Load, preprocess and deduplicate the chats of a request into `FetchedChats`."""
+    if request.filter_option == "Number of Entries":
+        total = min(request.limit, max(local_store.count_entries(store) - request.start_offset, 0))
+        pages = local_store.iter_latest_pages(
+            store, request.start_offset, request.limit, continuation_token=request.continuation_token
+        )
+    else:
+        total = local_store.count_range(store, request.range_start, request.range_end)
+        pages = local_store.iter_range_pages(store, request.range_start, request.range_end)
+
+    # Process titles page by page as they arrive, keeping only the columns
+    # the dataset needs
+    timestamps = []
+    assistants = []
+    chat_titles = []
+    processed_titles = []
+    last_row = None
+    for page in pages:
+        last_row = page[-1]
+        page_titles = [item["ChatTitle"][:50] for item in page]
+        timestamps.extend(item["TimeStamp"] for item in page)
+        assistants.extend(item["AssistantName"] for item in page)
+        chat_titles.extend(page_titles)
+        processed_titles.extend(title for title in preprocess_titles(page_titles) if title)
+        job.update(
+            "load",
+            _SYNC_PROGRESS
+            + (_LOAD_PROGRESS - _SYNC_PROGRESS) * min(len(chat_titles) / max(total, 1), 1.0),
+            f"Loaded {len(chat_titles)} of {total} chat entries",
+        )
+    if not chat_titles:
+        return None
+
+    dataset = ChatDataset.from_columns(timestamps, assistants, chat_titles)
+    next_token = None
+    if request.filter_option == "Number of Entries" and len(chat_titles) == request.limit:
+        next_token = local_store.encode_token(last_row)
+    # Collapse near-duplicate titles so prompts grow with the number of
+    # distinct intents rather than raw volume
+    job.update(message="Collapsing near-duplicate titles...")
+    title_groups = collapse_titles(processed_titles)
+    title_lines = format_title_groups(title_groups)
+    return FetchedChats(
+        dataset=dataset,
+        title_groups=title_groups,
+        title_lines=title_lines,
+        distinct_titles_text="\n".join(title for title, _ in title_groups),
+        # Retrieval index and aggregates used to answer chat questions
+        title_index=build_index(title_groups),
+        aggregates=build_aggregates(dataset, store),
+        next_token=next_token,
+        analysis={},
+    )
+
+
+def analyze(job, fetched):
+    """
+    Extract topics on a worker thread while the trend analysis streams in,
+    publishing both as partial results of the job.
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        topics_future = instrumentation.submit(
+            executor,
+            extract_window_topics,
+            fetched.dataset.titles(),
+            fetched.distinct_titles_text,
+        )
+        job.update("analysis", _LOAD_PROGRESS, "Extracting topics and analyzing trends...")
+        trend = ""
+        for piece in stream_trends(fetched.title_lines):
+            trend += piece
+            job.update(trend_analysis=trend)
+            if topics_future.done() and "topics" not in job.partial:
+                job.update(topics=topics_future.result())
+        topics = topics_future.result()
+        job.check()
+    finally:
+        # A cancelled job does not wait for the topics
+        executor.shutdown(wait=False, cancel_futures=True)
+    fetched.analysis.update(topics=topics, trend_analysis=trend)
+
+
+def run_sync(job):
+    """Job bringing the local mirror up to date, see `change_feed.ensure_current`."""
+    store = local_store.connect()
+    try:
+        job.update("sync", 0.0, "Syncing new chat entries...")
+        return change_feed.ensure_current(
+            get_container(), store, force=True, on_progress=lambda message: job.update(message=message)
+        )
+    finally:
+        store.close()
+
+
+def run_fetch(job, request):
+    """
+    Job running fetch, preprocessing, topics and trend analysis for a request.
+
+    Returns the `FetchedChats`, with topics and trends in its `analysis`, or
+    None if no chats match. The fetched chats are published as the partial
+    result "fetched" as soon as they are loaded.
+    """
+    store = local_store.connect()
+    try:
+        # Bring the local mirror up to date, unless the change-feed consumer
+        # already keeps it current, then answer from it
+        job.update("sync", 0.0, "Syncing new chat entries...")
+        change_feed.ensure_current(
+            get_container(), store, force=True, on_progress=lambda message: job.update(message=message)
+        )
+
+        # Fetches are cached process-wide, so sessions asking for the same
+        # chats share one columnar copy and repeat fetches are free
+        job.update("load", _SYNC_PROGRESS, "Loading chat entries...")
+        fetched = chat_dataset.get_or_build(
+            chat_dataset.fetch_key(*request),
+            fetch_version(store, request),
+            lambda: load_chats(job, store, request),
+        )
+        if fetched is None:
+            return None
+        job.update(fetched=fetched)
+
+        # Serve topics and trends computed for an earlier fetch of the same
+        # chats, or precomputed by precompute.py
+        if "topics" not in fetched.analysis and request.range_start is not None:
+            materialized = results_store.get_result(
+                store,
+                "window",
+                request.range_start,
+                request.range_end,
+                results_store.range_fingerprint(store, request.range_start, request.range_end),
+            )
+            if materialized is not None:
+                fetched.analysis.update(materialized)
+    finally:
+        store.close()
+
+    if "topics" not in fetched.analysis:
+        analyze(job, fetched)
+    return fetched
@@ -0,0 +1,220 @@
+"""
+Per-stage metrics: latency, Cosmos RU charges and LLM token usage.
+
+Events go into a process-wide ring buffer and are logged as JSON lines on the
+"chatdb.metrics" logger for monitoring. Each event is tagged with the run
+(e.g. one fetch) active in the current context, so a session can show the
+diagnostics of its own runs.
+"""
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+metrics_logger = logging.getLogger("chatdb.metrics")
+
+_events = deque(maxlen=5000)
+_events_lock = threading.Lock()
+_current_run = contextvars.ContextVar("chatdb_run", default=None)
+
+
+def record(stage, duration, **fields):
+    """Record one measurement of a stage, with optional RU/token/etc. fields."""
+    event = {
+        "run": _current_run.get(),
+        "stage": stage,
+        "duration": round(duration, 6),
+        "time": time.time(),
+        **{key: value for key, value in fields.items() if value is not None},
+    }
+    with _events_lock:
+        _events.append(event)
+    metrics_logger.info(json.dumps(event, default=str))
+    return event
+
+
+def set_run(run_id):
+    """Tag events recorded from now on in the current context with `run_id`."""
+    _current_run.set(run_id)
+
+
+@contextmanager
+def run(name):
+    """Tag every event recorded inside the block with a new run id."""
+    run_id = f"{name}-{uuid.uuid4().hex[:8]}"
+    token = _current_run.set(run_id)
+    start = time.perf_counter()
+    try:
+        yield run_id
+    finally:
+        record(name, time.perf_counter() - start)
+        _current_run.reset(token)
+
+
+@contextmanager
+def measure(stage, **fields):
+    """Time a block; the yielded dict can be filled with extra fields."""
+    extra = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        record(stage, time.perf_counter() - start, **extra)
+
+
+def timed(stage):
+    """Decorator recording the duration of every call as `stage`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit(executor, func, *args, **kwargs):
+    """Submit to an executor while keeping the caller's run tag."""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def events(run_ids=None):
+    """Return recorded events, optionally only those of the given runs."""
+    with _events_lock:
+        recorded = list(_events)
+    if run_ids is None:
+        return recorded
+    run_ids = set(run_ids)
+    return [event for event in recorded if event["run"] in run_ids]
+
+
+def summarize(recorded):
+    """Aggregate events per stage: calls, total/max duration, RUs and tokens."""
+    summary = {}
+    for event in recorded:
+        stage = summary.setdefault(
+            event["stage"],
+            {"stage": event["stage"], "calls": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+        )
+        stage["calls"] += 1
+        stage["total_seconds"] += event["duration"]
+        stage["max_seconds"] = max(stage["max_seconds"], event["duration"])
+        for key in ("request_charge", "pages", "items", "prompt_tokens", "completion_tokens"):
+            if key in event:
+                stage[key] = stage.get(key, 0) + event[key]
+    return list(summary.values())
+
+
+def export_json(recorded):
+    """Serialize events as a JSON document for external monitoring."""
+    return json.dumps({"events": recorded, "summary": summarize(recorded)}, indent=2, default=str)
+
+
+def _request_charge(container, headers=None):
+    try:
+        if not headers:
+            headers = container.client_connection.last_response_headers
+        return float(headers.get("x-ms-request-charge", 0))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def instrument_pages(container, pages, stage="cosmos_query", response_headers=None):
+    """
+    Wrap a Cosmos page iterator, recording RU charge and latency per page.
+
+    The charge is read from `response_headers`, the headers of the query's
+    latest page, or from the client's last response headers while those are
+    empty. A summary event for the whole query is recorded once it is
+    exhausted.
+    """
+    total_charge = 0.0
+    page_count = 0
+    item_count = 0
+    query_start = time.perf_counter()
+    page_start = query_start
+    for page in pages:
+        charge = _request_charge(container, response_headers)
+        items = len(page[0]) if isinstance(page, tuple) else len(page)
+        record(
+            f"{stage}.page",
+            time.perf_counter() - page_start,
+            request_charge=charge,
+            items=items,
+        )
+        total_charge += charge or 0.0
+        page_count += 1
+        item_count += items
+        yield page
+        page_start = time.perf_counter()
+    record(
+        stage,
+        time.perf_counter() - query_start,
+        request_charge=round(total_charge, 2),
+        pages=page_count,
+        items=item_count,
+    )
+
+
+class InstrumentedLLMClient:
+    """
+    Wrapper recording latency, time to first token and token usage of every
+    chat completion. Other attributes are forwarded to the wrapped client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = type("Completions", (), {})()
+        self.chat.completions.create = self.create
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def create(self, model, messages, stream=False, **kwargs):
+        start = time.perf_counter()
+        if stream:
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, stream=stream, **kwargs
+        )
+        if stream:
+            return self._stream(response, model, start)
+
+        usage = getattr(response, "usage", None)
+        record(
+            "llm_completion",
+            time.perf_counter() - start,
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cached=usage is None,
+        )
+        return response
+
+    def _stream(self, response_stream, model, start):
+        first_token = None
+        usage = None
+        for chunk in response_stream:
+            if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                first_token = time.perf_counter() - start
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        record(
+            "llm_completion",
+            time.perf_counter() - start,
+            model=model,
+            stream=True,
+            time_to_first_token=round(first_token, 6) if first_token is not None else None,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cached=usage is None,
+        )
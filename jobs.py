@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from cloud_config import JOB_WORKERS
+import instrumentation
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once the job has been cancelled."""
+
+
+class Job:
+    """
+    A unit of background work with its progress and partial results.
+
+    The work function receives the job and reports through `update`, which
+    also raises `JobCancelled` once the job is cancelled, so long stages stop
+    at their next report. Readers poll the attributes.
+    """
+
+    def __init__(self, key, description=""):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.description = description
+        self.state = QUEUED
+        self.stage = ""
+        self.progress = 0.0
+        self.message = ""
+        # Results available before the job finishes, e.g. a streamed text
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.owners = set()
+        self.created = time.time()
+        self.finished = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def done(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check(self):
+        """Raise `JobCancelled` if the job has been cancelled."""
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.key)
+
+    def update(self, stage=None, progress=None, message=None, **partial):
+        """Report progress and partial results, stopping here if cancelled."""
+        self.check()
+        if stage is not None:
+            self.stage = stage
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        self.partial.update(partial)
+
+
+class JobRunner:
+    """
+    Thread pool running jobs keyed by what they compute.
+
+    Submitting a key that is already in flight returns the running job
+    instead of starting another. Jobs are held by owners (e.g. Streamlit
+    sessions); a job whose last owner moved on to another job, or released
+    it, is cancelled.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chatdb-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, owner=None, description=""):
+        """Return the in-flight job for `key`, starting `fn(job, *args)` if there is none."""
+        with self._lock:
+            if owner is not None:
+                for job in list(self._jobs.values()):
+                    if job.key != key and owner in job.owners:
+                        self._release(job, owner)
+            job = self._jobs.get(key)
+            if job is None or job.cancelled:
+                job = Job(key, description)
+                self._jobs[key] = job
+                instrumentation.submit(self.executor, self._run, job, fn, args)
+            if owner is not None:
+                job.owners.add(owner)
+            return job
+
+    def release(self, job, owner):
+        """Drop `owner`'s interest in a job, cancelling it if nobody else holds it."""
+        with self._lock:
+            self._release(job, owner)
+
+    def _release(self, job, owner):
+        job.owners.discard(owner)
+        if not job.owners and not job.done:
+            job.cancel()
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def jobs(self):
+        """Return the jobs currently in flight."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, fn, args):
+        try:
+            job.check()
+            job.state = RUNNING
+            job.result = fn(job, *args)
+            job.progress = 1.0
+            job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+            logging.info(f"Job {job.description or job.key} cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.state = FAILED
+            logging.error(f"Error running job {job.description or job.key}: {e}")
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+
+def get_runner():
+    """Return the process-wide job runner."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a time-to-live."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    """SQLite-backed cache shared by all processes using the same directory."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        created REAL NOT NULL,
+        accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed);
+    """
+
+    def __init__(self, cache_dir, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, "llm_cache.sqlite3"),
+            timeout=30,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Drop expired entries, then the least recently used beyond the limit
+            self._conn.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.ttl,)
+            )
+            self._conn.execute(
+                """
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def cache_key(model, messages, temperature=None, **kwargs):
+    """Hash a chat completion request into a cache key."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        **kwargs,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _cached_response(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=None,
+    )
+
+
+def _cached_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class CachedLLMClient:
+    """
+    Drop-in wrapper for an OpenAI client that caches chat completions.
+
+    Requests are keyed by a hash of the model, messages, temperature and any
+    other parameters except `stream`. Only the completion text is cached; hits
+    are returned as lightweight objects exposing the same `choices[0].message`
+    (or, when streaming, `choices[0].delta`) attributes callers read. Any
+    backend with `get(key)` and `set(key, value)` can be plugged in.
+    """
+
+    def __init__(self, client, backend):
+        self.client = client
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def create(self, model, messages, temperature=None, stream=False, **kwargs):
+        key = cache_key(model, messages, temperature, **kwargs)
+        try:
+            content = self.backend.get(key)
+        except Exception as e:
+            logging.error(f"Error reading LLM cache: {e}")
+            content = None
+        self._count(content is not None)
+
+        if content is not None:
+            return iter([_cached_chunk(content)]) if stream else _cached_response(content)
+
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=stream,
+            **kwargs,
+        )
+        if stream:
+            return self._stream_and_store(key, response)
+        self._store(key, response.choices[0].message.content)
+        return response
+
+    def _stream_and_store(self, key, response_stream):
+        parts = []
+        for chunk in response_stream:
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or "")
+            yield chunk
+        # Only complete streams reach this point and are cached
+        self._store(key, "".join(parts))
+
+    def _store(self, key, content):
+        if content is None:
+            return
+        try:
+            self.backend.set(key, content)
+        except Exception as e:
+            logging.error(f"Error writing LLM cache: {e}")
+
+    def stats(self):
+        """Return hit/miss counters and the number of cached entries."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.backend)}
@@ -0,0 +1,392 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from cloud_config import FETCH_PAGE_SIZE, LOCAL_STORE_DIR, LOCAL_STORE_SYNC_INTERVAL
+from cosmos_fetch import iter_query_pages_parallel
+import rolling_aggregates
+
+DB_FILENAME = "chats.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    TimeStamp TEXT NOT NULL,
+    AssistantName TEXT,
+    ChatTitle TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chats_timestamp ON chats (TimeStamp);
+CREATE INDEX IF NOT EXISTS idx_chats_timestamp_id ON chats (TimeStamp, id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Only documents at or after the watermark are pulled from Cosmos. ">=" rather
+# than ">" so that chats sharing the last seen TimeStamp are not missed; the
+# upsert below makes the overlap harmless.
+SYNC_QUERY = """
+    SELECT c.id, c.TimeStamp, c.AssistantName, c.ChatTitle
+    FROM c
+    WHERE c.TimeStamp >= @watermark
+"""
+
+SYNC_WATERMARK_KEY = "sync_watermark"
+# Continuation of the change-feed consumer (see change_feed.py)
+CHANGE_FEED_CHECKPOINT_KEY = "change_feed_continuation"
+
+# Database files whose schema and aggregates this process has set up
+_initialized = set()
+_initialized_lock = threading.Lock()
+
+
+def connect(store_dir=LOCAL_STORE_DIR):
+    """
+    Open the local mirror, creating the database and schema if needed.
+
+    The schema and rolling aggregates are checked on the first connection to
+    a database in this process only, so reruns open it cheaply.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    db_path = os.path.abspath(os.path.join(store_dir, DB_FILENAME))
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _initialized_lock:
+        if db_path not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            rolling_aggregates.ensure_built(conn)
+            _initialized.add(db_path)
+    return conn
+
+
+def get_watermark(conn):
+    """
+    Return the TimeStamp the next sync resumes from, or an empty string.
+
+    The watermark is recorded by `sync` itself: the change-feed consumer
+    stores chats in feed order, so the newest stored TimeStamp says nothing
+    about which older chats are still missing. Stores synced before the
+    watermark was recorded fall back to their newest TimeStamp, unless the
+    change feed has written to them.
+    """
+    watermark = get_state(conn, SYNC_WATERMARK_KEY)
+    if watermark is not None:
+        return watermark
+    if get_state(conn, CHANGE_FEED_CHECKPOINT_KEY) is not None:
+        return ""
+    row = conn.execute("SELECT MAX(TimeStamp) FROM chats").fetchone()
+    return row[0] or ""
+
+
+def get_state(conn, key):
+    """Return a value recorded in the sync_state table, or None."""
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn, key, value):
+    """Record a value in the sync_state table; committed with the caller's transaction."""
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+        (key, str(value)),
+    )
+
+
+def _new_items(conn, items):
+    """Return the items whose ids are not stored yet, each id once."""
+    unique = {item["id"]: item for item in items}
+    ids = list(unique)
+    for i in range(0, len(ids), 500):
+        batch = ids[i : i + 500]
+        placeholders = ",".join("?" * len(batch))
+        for row in conn.execute(f"SELECT id FROM chats WHERE id IN ({placeholders})", batch):
+            del unique[row[0]]
+    return list(unique.values())
+
+
+def begin_write(conn):
+    """
+    Take the database write lock, unless the caller's transaction holds it.
+
+    Writers that read before writing (new ids, the title sketch) take it
+    first, so a concurrent sync and change-feed consumer cannot both count
+    the same chats.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def upsert_items(conn, items):
+    """
+    Insert or update chat documents in the local mirror.
+
+    Chats seen for the first time are also folded into the rolling
+    aggregates; updates of stored chats are not counted again. Returns the
+    number of chats seen for the first time.
+    """
+    items = list(items)
+    begin_write(conn)
+    new_items = _new_items(conn, items)
+    rolling_aggregates.add_chats(conn, new_items)
+    conn.executemany(
+        """
+        INSERT INTO chats (id, TimeStamp, AssistantName, ChatTitle) VALUES (?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            TimeStamp = excluded.TimeStamp,
+            AssistantName = excluded.AssistantName,
+            ChatTitle = excluded.ChatTitle
+        """,
+        (
+            (
+                item["id"],
+                item["TimeStamp"],
+                item.get("AssistantName"),
+                item.get("ChatTitle") or "",
+            )
+            for item in items
+        ),
+    )
+    return len(new_items)
+
+
+def mark_changed(conn, added=0):
+    """
+    Record that chats were written, in the caller's transaction.
+
+    Keeps the entry count current so readers never need a full COUNT(*).
+    `added` is the number of new chats, as returned by `upsert_items`; the
+    count is only taken in full for stores that never recorded one.
+    """
+    begin_write(conn)
+    count = get_state(conn, "chat_count")
+    if count is None:
+        count = conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+    else:
+        count = int(count) + added
+    set_state(conn, "chat_count", count)
+
+
+def sync_due(conn, min_interval=LOCAL_STORE_SYNC_INTERVAL):
+    """Return True if the last sync finished `min_interval` seconds ago or more."""
+    last_sync = get_state(conn, "last_sync")
+    return not last_sync or time.time() - float(last_sync) >= min_interval
+
+
+def sync(
+    container,
+    conn,
+    min_interval=LOCAL_STORE_SYNC_INTERVAL,
+    force=False,
+    page_size=FETCH_PAGE_SIZE,
+    on_page=None,
+):
+    """
+    Pull documents newer than the local watermark from Cosmos into the mirror.
+
+    Documents are written page by page, so memory stays bounded by
+    `page_size`; `on_page` is called with the running total after each page.
+    Each page is committed in its own short write transaction, so the write
+    lock is never held across Cosmos reads. Syncs are skipped if the previous
+    one finished less than `min_interval` seconds ago, unless `force` is set.
+    Returns the number of documents pulled.
+    """
+    if not force and not sync_due(conn, min_interval):
+        return 0
+
+    watermark = get_watermark(conn)
+    # Feed ranges are read concurrently, so pages arrive in no TimeStamp
+    # order; the watermark is only recorded once every page is stored, and an
+    # interrupted sync starts over from the previous one
+    pages = iter_query_pages_parallel(
+        container,
+        SYNC_QUERY,
+        parameters=[{"name": "@watermark", "value": watermark}],
+        page_size=page_size,
+    )
+
+    pulled = 0
+    newest = watermark
+    for page, _ in pages:
+        mark_changed(conn, upsert_items(conn, page))
+        conn.commit()
+        pulled += len(page)
+        newest = max(newest, max(item["TimeStamp"] for item in page))
+        if on_page:
+            on_page(pulled)
+
+    begin_write(conn)
+    set_state(conn, SYNC_WATERMARK_KEY, newest)
+    set_state(conn, "last_sync", time.time())
+    conn.commit()
+    logging.info(f"Local store synced {pulled} documents since '{watermark}'")
+    return pulled
+
+
+def _iter_pages(cursor, page_size):
+    while True:
+        rows = cursor.fetchmany(page_size)
+        if not rows:
+            break
+        yield [dict(row) for row in rows]
+
+
+def query_range(conn, start_date_str, end_date_str):
+    """Return chats with a TimeStamp between the given bounds, newest first."""
+    rows = conn.execute(
+        """
+        SELECT id, TimeStamp, AssistantName, ChatTitle
+        FROM chats
+        WHERE TimeStamp BETWEEN ? AND ?
+        ORDER BY TimeStamp DESC
+        """,
+        (start_date_str, end_date_str),
+    )
+    return [dict(row) for row in rows]
+
+
+def iter_range_pages(conn, start_date_str, end_date_str, page_size=FETCH_PAGE_SIZE):
+    """Yield pages of chats between the given bounds, newest first."""
+    cursor = conn.execute(
+        """
+        SELECT id, TimeStamp, AssistantName, ChatTitle
+        FROM chats
+        WHERE TimeStamp BETWEEN ? AND ?
+        ORDER BY TimeStamp DESC
+        """,
+        (start_date_str, end_date_str),
+    )
+    return _iter_pages(cursor, page_size)
+
+
+def iter_pages_after(conn, rowid, page_size=FETCH_PAGE_SIZE):
+    """
+    Yield pages of chats stored after `rowid`, in the order they were stored.
+
+    Each chat carries its "rowid". Updates keep a chat's rowid, so readers
+    that remember the last rowid they processed see every new chat once,
+    whatever its TimeStamp.
+    """
+    cursor = conn.execute(
+        """
+        SELECT rowid, id, TimeStamp, AssistantName, ChatTitle
+        FROM chats
+        WHERE rowid > ?
+        ORDER BY rowid
+        """,
+        (rowid,),
+    )
+    return _iter_pages(cursor, page_size)
+
+
+def count_range(conn, start_date_str, end_date_str):
+    """Return the number of chats with a TimeStamp between the given bounds."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM chats WHERE TimeStamp BETWEEN ? AND ?",
+        (start_date_str, end_date_str),
+    ).fetchone()[0]
+
+
+def range_version(conn, start_date_str=None, end_date_str=None):
+    """
+    Return a cheap version of the chats in a TimeStamp range: their count and
+    newest TimeStamp, read from the TimeStamp index.
+
+    New chats landing in the range change it; chats elsewhere do not.
+    Without a range, the version covers the whole mirror and uses the count
+    recorded by `mark_changed`.
+    """
+    if start_date_str is None or end_date_str is None:
+        newest = conn.execute("SELECT MAX(TimeStamp) FROM chats").fetchone()[0]
+        row = (count_entries(conn), newest)
+    else:
+        row = conn.execute(
+            "SELECT COUNT(*), MAX(TimeStamp) FROM chats WHERE TimeStamp BETWEEN ? AND ?",
+            (start_date_str, end_date_str),
+        ).fetchone()
+    return f"{row[0]}:{row[1] or ''}"
+
+
+def encode_token(row):
+    """Return the continuation token pointing just past a newest-first row."""
+    return f"{row['TimeStamp']}\t{row['id']}"
+
+
+def query_page(conn, continuation_token=None, limit=FETCH_PAGE_SIZE):
+    """
+    Return one newest-first page of chats and the token for the next page.
+
+    Pages are addressed by (TimeStamp, id) keyset rather than OFFSET, so every
+    page costs one index seek no matter how deep it is. The returned token is
+    None once the end is reached.
+    """
+    if continuation_token is None:
+        cursor = conn.execute(
+            """
+            SELECT id, TimeStamp, AssistantName, ChatTitle
+            FROM chats
+            ORDER BY TimeStamp DESC, id DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+    else:
+        timestamp, chat_id = continuation_token.split("\t", 1)
+        cursor = conn.execute(
+            """
+            SELECT id, TimeStamp, AssistantName, ChatTitle
+            FROM chats
+            WHERE (TimeStamp, id) < (?, ?)
+            ORDER BY TimeStamp DESC, id DESC
+            LIMIT ?
+            """,
+            (timestamp, chat_id, limit),
+        )
+    rows = [dict(row) for row in cursor]
+    next_token = encode_token(rows[-1]) if len(rows) == limit else None
+    return rows, next_token
+
+
+def seek(conn, start_offset):
+    """
+    Return the continuation token of the page starting at `start_offset`.
+
+    The offset is walked on the covering (TimeStamp, id) index inside SQLite,
+    which reads no chats. Sessions paging on from a fetched page continue
+    from its token instead (see `query_page`).
+    """
+    if not start_offset:
+        return None
+    row = conn.execute(
+        "SELECT TimeStamp, id FROM chats ORDER BY TimeStamp DESC, id DESC LIMIT 1 OFFSET ?",
+        (start_offset - 1,),
+    ).fetchone()
+    # Past the end: a token no chat sorts before
+    return encode_token(row) if row else encode_token({"TimeStamp": "", "id": ""})
+
+
+def iter_latest_pages(conn, start_offset, limit, page_size=FETCH_PAGE_SIZE, continuation_token=None):
+    """
+    Yield pages of `limit` chats, newest first, starting at
+    `continuation_token` if given, else at `start_offset`.
+    """
+    token = continuation_token if continuation_token is not None else seek(conn, start_offset)
+    remaining = limit
+    while remaining > 0:
+        rows, token = query_page(conn, token, min(page_size, remaining))
+        if not rows:
+            break
+        remaining -= len(rows)
+        yield rows
+        if token is None:
+            break
+
+
+def count_entries(conn):
+    """Return the number of chats in the local mirror, as recorded by `sync`."""
+    count = get_state(conn, "chat_count")
+    if count is None:
+        return conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+    return int(count)
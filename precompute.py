@@ -0,0 +1,174 @@
+"""
+Precompute topic drift, window topics and trend analyses outside Streamlit.
+
+Results go to the materialized results store (see results_store.py), from which
+the app serves them as long as the chats they were computed from are
+unchanged. Windows whose chats have not changed since the last run are
+skipped. Usage, e.g. from cron:
+
+    python precompute.py [--years 2024 2025] [--quarters Q1 Q2 Q3 Q4]
+        [--rolling-days 7 30 90] [--max-workers 2] [--force] [--no-sync]
+
+Quarter windows are stored under the same ranges as the app's quarterly
+date range selection, topic drift under the years of the Analytics view and
+rolling windows under the ranges of a matching custom date range ending
+today. Exits with status 1 if any window failed.
+"""
+import argparse
+import logging
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from cloud_config import LOCAL_STORE_DIR, get_container
+from dedup import collapse_titles, format_title_groups
+from preprocessor import preprocess_titles
+from quarterly_topics import QUARTER_RANGES, quarter_range, to_timestamp
+from topic_engine import extract_window_topics
+from trend_analysis import analyze_trends
+import instrumentation
+import local_store
+import results_store
+import topic_drift
+
+LOCK_FILENAME = "precompute.lock"
+
+# A result to precompute: "topic_drift" or "window", over a TimeStamp range
+Task = namedtuple("Task", ["kind", "start", "end", "label"])
+
+
+def analyze_window(conn, start_date_str, end_date_str):
+    """Compute the topics and trend analysis the app shows for a fetched range."""
+    chat_titles = [
+        item["ChatTitle"][:50]
+        for item in local_store.query_range(conn, start_date_str, end_date_str)
+    ]
+    if not chat_titles:
+        return {"topics": [], "trend_analysis": ""}
+
+    title_groups = collapse_titles(
+        title for title in preprocess_titles(chat_titles) if title
+    )
+    distinct_titles_text = "\n".join(title for title, _ in title_groups)
+    return {
+        "topics": extract_window_topics(chat_titles, distinct_titles_text, conn),
+        "trend_analysis": analyze_trends(format_title_groups(title_groups)),
+    }
+
+
+def precompute(task, force=False):
+    """
+    Compute and store the result of a task, unless its chats are unchanged.
+
+    Returns True if the result was recomputed.
+    """
+    kind, start, end, label = task
+    conn = local_store.connect()
+    try:
+        fingerprint = results_store.range_fingerprint(conn, start, end)
+        if not force and results_store.get_result(conn, kind, start, end, fingerprint) is not None:
+            logging.info(f"{label} {kind}: unchanged, skipped")
+            return False
+
+        with instrumentation.run(f"precompute.{kind}"):
+            if kind == "topic_drift":
+                payload = topic_drift.compute_drift(conn, start, end)
+            else:
+                payload = analyze_window(conn, start, end)
+        results_store.put_result(conn, kind, start, end, fingerprint, payload)
+        logging.info(f"{label} {kind}: stored")
+        return True
+    finally:
+        conn.close()
+
+
+def build_tasks(years, quarters, rolling_days, today=None):
+    """List the tasks for the requested years, quarters and rolling windows."""
+    tasks = []
+    for year in years:
+        start, end = topic_drift.year_range(year)
+        tasks.append(Task("topic_drift", start, end, year))
+        for quarter in quarters:
+            start_date, end_date = quarter_range(year, quarter)
+            start, end = to_timestamp(start_date), to_timestamp(end_date)
+            tasks.append(Task("window", start, end, f"{year} {quarter}"))
+
+    today = today or datetime.now().date()
+    for days in rolling_days:
+        start_date = today - timedelta(days=days)
+        tasks.append(
+            Task(
+                "window",
+                f"{start_date:%Y-%m-%d}T00:00:00.000000Z",
+                f"{today:%Y-%m-%d}T23:59:59.999999Z",
+                f"last {days} days",
+            )
+        )
+    return tasks
+
+
+def _acquire_lock(store_dir):
+    """Take an exclusive lock so overlapping cron runs do not duplicate work."""
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory locks on this platform; rely on the scheduler instead
+        return True, None
+    os.makedirs(store_dir, exist_ok=True)
+    lock_file = open(os.path.join(store_dir, LOCK_FILENAME), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False, None
+    return True, lock_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", nargs="+", default=[str(datetime.now().year)])
+    parser.add_argument("--quarters", nargs="+", choices=list(QUARTER_RANGES), default=list(QUARTER_RANGES))
+    parser.add_argument("--rolling-days", type=int, nargs="*", default=[])
+    parser.add_argument("--max-workers", type=int, default=2, help="windows computed concurrently")
+    parser.add_argument("--force", action="store_true", help="recompute unchanged windows too")
+    parser.add_argument("--no-sync", action="store_true", help="skip syncing the local store from Cosmos")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Per-stage metrics are only logged by the app's monitoring setup
+    logging.getLogger("chatdb.metrics").setLevel(logging.WARNING)
+
+    locked, lock_file = _acquire_lock(LOCAL_STORE_DIR)
+    if not locked:
+        logging.warning("Another precompute run is in progress, exiting")
+        return 0
+
+    try:
+        if not args.no_sync:
+            conn = local_store.connect()
+            try:
+                pulled = local_store.sync(get_container(), conn, force=True)
+                logging.info(f"Synced {pulled} chat entries")
+            finally:
+                conn.close()
+
+        failed = 0
+        tasks = build_tasks(args.years, args.quarters, args.rolling_days)
+        with ThreadPoolExecutor(max_workers=max(args.max_workers, 1)) as executor:
+            futures = {executor.submit(precompute, task, args.force): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error precomputing {task.label} {task.kind}: {e}")
+                    failed += 1
+        return 1 if failed else 0
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
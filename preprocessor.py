@@ -1,12 +1,31 @@
-import nltk
-from nltk.corpus import stopwords
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from instrumentation import timed
 
-nltk.download("punkt", quiet=True)
-nltk.download("stopwords", quiet=True)
+# Copy of NLTK's English stopword list, so importing this module needs
+# neither NLTK nor network access.
+BUNDLED_STOPWORDS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "resources", "english_stopwords.txt"
+)
 
-# Initialize NLTK stopwords
-stop_words = set(stopwords.words("english"))
+
+@lru_cache(maxsize=None)
+def get_stop_words():
+    """Load the English stopwords on first use, preferring the bundled copy."""
+    try:
+        with open(BUNDLED_STOPWORDS, encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f if line.strip())
+    except OSError:
+        import nltk
+        from nltk.corpus import stopwords
+
+        try:
+            return frozenset(stopwords.words("english"))
+        except LookupError:
+            nltk.download("stopwords", quiet=True)
+            return frozenset(stopwords.words("english"))
 
 
 def clean_text(text):
@@ -19,13 +38,79 @@ def clean_text(text):
 
 def remove_stopwords(text):
     """Remove common stopwords from the text."""
+    stop_words = get_stop_words()
     word_tokens = text.split(" ")
     filtered_text = [word for word in word_tokens if word.lower() not in stop_words]
     return " ".join(filtered_text)
 
+@timed("preprocess_text")
 def preprocess_text(text):
     """Preprocess the text before sending it to the LLM."""
     text = clean_text(text)
     text = remove_stopwords(text)
 
     return text
+
+
+# Batch preprocessing. Produces the same words as `preprocess_text`, but per
+# title: the titles are cleaned in one pass over a joined buffer with a
+# translate table (or a precompiled pattern for non-ASCII text), and each
+# distinct word is lowercased and checked against the stopwords only once.
+_SPECIAL_CHARS = re.compile(r"[^A-Za-z0-9\s]")
+_ASCII_SPECIAL_CHARS = str.maketrans(
+    "",
+    "",
+    "".join(
+        chr(c) for c in range(128) if not chr(c).isalnum() and not chr(c).isspace()
+    ),
+)
+# Whitespace, so cleaning keeps it, and never produced by the cleaning itself
+_TITLE_SEPARATOR = "\x1e"
+_PARALLEL_THRESHOLD = 200_000
+
+
+def _preprocess_chunk(titles):
+    text = _TITLE_SEPARATOR.join(titles)
+    if text.count(_TITLE_SEPARATOR) != len(titles) - 1:
+        # A title contains the separator itself; clean titles one by one.
+        return [remove_stopwords(clean_text(title)) for title in titles]
+
+    if text.isascii():
+        text = text.translate(_ASCII_SPECIAL_CHARS)
+    else:
+        text = _SPECIAL_CHARS.sub("", text)
+
+    stop_words = get_stop_words()
+    keep_word = {}
+    processed = []
+    for title in text.split(_TITLE_SEPARATOR):
+        kept = []
+        for word in title.split():
+            keep = keep_word.get(word)
+            if keep is None:
+                keep = keep_word[word] = word.lower() not in stop_words
+            if keep:
+                kept.append(word)
+        processed.append(" ".join(kept))
+    return processed
+
+
+@timed("preprocess_titles")
+def preprocess_titles(titles, processes=None, chunksize=50_000):
+    """
+    Preprocess an iterable of titles, returning one cleaned string per title.
+
+    With `processes` set, inputs larger than a couple of hundred thousand
+    titles are sharded across a process pool in chunks of `chunksize`.
+    Joining the non-empty results with spaces gives the same text as
+    `preprocess_text` on the newline-joined titles.
+    """
+    titles = list(titles)
+    if not titles:
+        return []
+    if not processes or len(titles) < _PARALLEL_THRESHOLD:
+        return _preprocess_chunk(titles)
+
+    chunks = [titles[i : i + chunksize] for i in range(0, len(titles), chunksize)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return [title for chunk in executor.map(_preprocess_chunk, chunks) for title in chunk]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+QUARTER_RANGES = {
+    "Q1": ("01/01", "03/31"),
+    "Q2": ("04/01", "06/30"),
+    "Q3": ("07/01", "09/30"),
+    "Q4": ("10/01", "12/31"),
+}
+
+
+def quarter_range(year, quarter):
+    """Return the (start, end) dates of a quarter as "%Y/%m/%d" strings."""
+    start, end = QUARTER_RANGES[quarter]
+    return f"{year}/{start}", f"{year}/{end}"
+
+
+def to_timestamp(date_str):
+    """Convert a "%Y/%m/%d" date to the store's TimeStamp format, at midnight."""
+    date_obj = datetime.strptime(date_str, "%Y/%m/%d")
+    return date_obj.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
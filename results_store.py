@@ -0,0 +1,75 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+# Results computed ahead of time by precompute.py, keyed by the kind of result
+# and the TimeStamp range it covers. The fingerprint identifies the chats the
+# result was computed from, so stale results are never served.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS materialized_results (
+    kind TEXT NOT NULL,
+    range_start TEXT NOT NULL,
+    range_end TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at TEXT NOT NULL,
+    PRIMARY KEY (kind, range_start, range_end)
+);
+"""
+
+
+def range_fingerprint(conn, start_date_str, end_date_str):
+    """Hash the ids and titles of the chats in a TimeStamp range of the local store."""
+    digest = hashlib.sha256()
+    rows = conn.execute(
+        """
+        SELECT id, ChatTitle FROM chats
+        WHERE TimeStamp BETWEEN ? AND ?
+        ORDER BY TimeStamp, id
+        """,
+        (start_date_str, end_date_str),
+    )
+    for row in rows:
+        digest.update(f"{row[0]}\t{row[1]}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_result(conn, kind, start_date_str, end_date_str, fingerprint=None):
+    """
+    Return a materialized result, or None if there is none.
+
+    With `fingerprint` set, a result computed from different chats counts as
+    missing.
+    """
+    conn.executescript(SCHEMA)
+    row = conn.execute(
+        """
+        SELECT fingerprint, payload FROM materialized_results
+        WHERE kind = ? AND range_start = ? AND range_end = ?
+        """,
+        (kind, start_date_str, end_date_str),
+    ).fetchone()
+    if row is None or (fingerprint is not None and row[0] != fingerprint):
+        return None
+    return json.loads(row[1])
+
+
+def put_result(conn, kind, start_date_str, end_date_str, fingerprint, payload):
+    """Store a result, replacing any previous one for the same kind and range."""
+    conn.executescript(SCHEMA)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO materialized_results
+            (kind, range_start, range_end, fingerprint, payload, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            kind,
+            start_date_str,
+            end_date_str,
+            fingerprint,
+            json.dumps(payload),
+            datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        ),
+    )
+    conn.commit()
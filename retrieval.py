@@ -0,0 +1,179 @@
+import logging
+from collections import Counter
+import topic_engine
+import topic_index
+
+# Number of titles and previous messages sent with each chat question
+TOP_K_TITLES = 60
+HISTORY_MESSAGES = 6
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over short documents such as chat titles.
+
+    Term weights are precomputed into a sparse matrix when the index is
+    built, so a search is a single sparse matrix-vector product.
+    """
+
+    def __init__(self, documents, payloads=None, k1=1.5, b=0.75):
+        import numpy as np
+        from scipy import sparse
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.documents = list(documents)
+        self.payloads = list(payloads) if payloads is not None else self.documents
+        self.vectorizer = CountVectorizer(stop_words="english")
+        tf = self.vectorizer.fit_transform(self.documents).tocsr().astype(np.float64)
+
+        n_documents = tf.shape[0]
+        document_frequency = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log(
+            (n_documents - document_frequency + 0.5) / (document_frequency + 0.5) + 1
+        )
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        average_length = lengths.mean() or 1.0
+
+        rows = np.repeat(np.arange(n_documents), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * lengths[rows] / average_length)
+        weights = tf.data * (k1 + 1) / (tf.data + norm) * idf[tf.indices]
+        self.matrix = sparse.csr_matrix(
+            (weights, tf.indices, tf.indptr), shape=tf.shape
+        )
+
+    def search(self, query, k=TOP_K_TITLES):
+        """Return up to `k` (payload, score) pairs matching the query, best first."""
+        import numpy as np
+
+        query_terms = self.vectorizer.transform([query])
+        if query_terms.nnz == 0:
+            return []
+        query_terms.data[:] = 1
+        scores = np.asarray((self.matrix @ query_terms.T).todense()).ravel()
+
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(self.payloads[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def build_index(title_groups):
+    """Index collapsed (title, count) groups; returns None if nothing is indexable."""
+    try:
+        return BM25Index(
+            [title for title, _ in title_groups],
+            payloads=[(title, count) for title, count in title_groups],
+        )
+    except ValueError:
+        # Every title consisted of stopwords only
+        return None
+
+
+def _format_counts(counts, chronological=False):
+    pairs = sorted(counts.items()) if chronological else counts.most_common()
+    return "\n".join(f"- {key}: {count}" for key, count in pairs)
+
+
+def _count_values(values):
+    import numpy as np
+
+    keys, counts = np.unique(values, return_counts=True)
+    return Counter(dict(zip(keys.tolist(), counts.tolist())))
+
+
+def build_aggregates(dataset, conn=None):
+    """
+    Summarize a fetched `ChatDataset` as counts per assistant, period and topic.
+
+    The text is computed once per fetch and sent with every question instead
+    of the full list of titles.
+    """
+    import numpy as np
+
+    oldest, newest = dataset.timestamp_range()
+    by_assistant = Counter(
+        dict(
+            zip(
+                dataset.assistants,
+                np.bincount(dataset.assistant_codes, minlength=len(dataset.assistants)).tolist(),
+            )
+        )
+    )
+    by_month = _count_values(
+        np.datetime_as_string(dataset.timestamps.astype("datetime64[M]"))
+    )
+    by_day = _count_values(np.datetime_as_string(dataset.timestamps.astype("datetime64[D]")))
+
+    sections = [
+        f"Total chats: {len(dataset)} between {oldest[:10]} and {newest[:10]}",
+        f"Chats per assistant:\n{_format_counts(by_assistant)}",
+        f"Chats per month:\n{_format_counts(by_month, chronological=True)}",
+    ]
+    if len(by_day) <= 62:
+        sections.append(f"Chats per day:\n{_format_counts(by_day, chronological=True)}")
+
+    if conn is not None:
+        try:
+            sections.append(_topic_aggregates(conn, oldest, newest))
+        except Exception as e:
+            logging.error(f"Error computing topic aggregates: {e}")
+    return "\n\n".join(section for section in sections if section)
+
+
+def _topic_aggregates(conn, start_timestamp, end_timestamp, top=3):
+    import numpy as np
+
+    engine = topic_engine.get_engine()
+    if not engine.is_fitted:
+        return ""
+    assignments = topic_index.load_assignments(conn, start_timestamp, end_timestamp)
+    if not len(assignments.ids):
+        return ""
+
+    def name(topic_idx):
+        terms = ", ".join(keyword["term"] for keyword in engine.topic_keywords(topic_idx, 5))
+        return f"Topic {topic_idx + 1} ({terms})"
+
+    def top_topics(counts):
+        ranked = [topic_idx for topic_idx in counts.argsort()[::-1][:top] if counts[topic_idx] > 0]
+        return ", ".join(f"Topic {topic_idx + 1}: {int(counts[topic_idx])}" for topic_idx in ranked)
+
+    assistants, by_assistant = topic_index.topic_counts_by_assistant(assignments)
+    months, by_month = topic_index.topic_counts_by_period(assignments, "month")
+    totals = by_assistant.sum(axis=0)
+    lines = [
+        f"- {name(topic_idx)}: {int(totals[topic_idx])}"
+        for topic_idx in totals.argsort()[::-1]
+        if totals[topic_idx] > 0
+    ]
+    sections = [
+        "Chats per topic:\n" + "\n".join(lines),
+        "Top topics per assistant:\n"
+        + "\n".join(
+            f"- {assistant}: {top_topics(counts)}" for assistant, counts in zip(assistants, by_assistant)
+        ),
+        "Top topics per month:\n"
+        + "\n".join(
+            f"- {month}: {top_topics(counts)}"
+            for month, counts in zip(np.datetime_as_string(months, unit="M"), by_month)
+        ),
+    ]
+    return "\n\n".join(sections)
+
+
+def relevant_titles(index, title_groups, question, k=TOP_K_TITLES):
+    """
+    Return up to `k` title groups for a question.
+
+    BM25 matches come first; the remaining slots are filled with the most
+    frequent titles so broad questions still get representative data.
+    """
+    selected = [payload for payload, _ in index.search(question, k)] if index else []
+    seen = {title for title, _ in selected}
+    for title, count in title_groups:
+        if len(selected) >= k:
+            break
+        if title not in seen:
+            selected.append((title, count))
+            seen.add(title)
+    return selected
@@ -0,0 +1,180 @@
+import hashlib
+import io
+import json
+from collections import Counter
+
+# Aggregates kept current as chats land in the local store, so dashboards
+# read a few rows instead of scanning history. Chat counts are kept per day
+# and month and AssistantName; title frequencies in a count-min sketch plus
+# a bounded set of candidate top titles.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_volume_rollup (
+    period_kind TEXT NOT NULL,
+    period TEXT NOT NULL,
+    assistant TEXT NOT NULL,
+    chats INTEGER NOT NULL,
+    PRIMARY KEY (period_kind, period, assistant)
+);
+CREATE TABLE IF NOT EXISTS title_sketches (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+ROLLUP_PERIODS = {"day": 10, "month": 7}
+
+SKETCH_DEPTH = 4
+SKETCH_WIDTH = 2**14
+TOP_TITLE_CANDIDATES = 500
+
+_BUILT_KEY = "rollups_built"
+
+def normalize_title(title):
+    """Key titles case- and whitespace-insensitively, like the prompts show them."""
+    return " ".join((title or "").lower().split())[:100]
+
+
+class TitleSketch:
+    """
+    Count-min sketch of title frequencies with a bounded set of candidate
+    heavy hitters, whose counts are the sketch estimates.
+    """
+
+    def __init__(self, depth=SKETCH_DEPTH, width=SKETCH_WIDTH, capacity=TOP_TITLE_CANDIDATES):
+        import numpy as np
+
+        self.counts = np.zeros((depth, width), dtype=np.uint32)
+        self.capacity = capacity
+        self.candidates = {}
+
+    def _buckets(self, title):
+        depth, width = self.counts.shape
+        digest = hashlib.blake2b(title.encode("utf-8"), digest_size=4 * depth).digest()
+        return [
+            int.from_bytes(digest[4 * row : 4 * row + 4], "little") % width
+            for row in range(depth)
+        ]
+
+    def add(self, titles):
+        """Count an iterable of (already normalized) titles."""
+        import numpy as np
+
+        batch = Counter(title for title in titles if title)
+        if not batch:
+            return
+        # One column of buckets per distinct title, one row per hash function
+        buckets = np.array([self._buckets(title) for title in batch]).T
+        rows = np.arange(self.counts.shape[0])[:, None]
+        np.add.at(self.counts, (rows, buckets), np.array(list(batch.values()), dtype=np.uint32))
+        estimates = self.counts[rows, buckets].min(axis=0)
+        self.candidates.update(zip(batch, estimates.tolist()))
+        if len(self.candidates) > 2 * self.capacity:
+            kept = sorted(self.candidates.items(), key=lambda pair: pair[1], reverse=True)
+            self.candidates = dict(kept[: self.capacity])
+
+    def estimate(self, title):
+        """Upper-bound estimate of how often a normalized title was seen."""
+        import numpy as np
+
+        rows = np.arange(self.counts.shape[0])
+        return int(self.counts[rows, self._buckets(title)].min())
+
+    def top(self, k=20):
+        """Return the `k` most frequent candidate titles as (title, count) pairs."""
+        # Re-estimate, as collisions may have raised counts since a title was last seen
+        estimates = [(title, self.estimate(title)) for title in self.candidates]
+        return sorted(estimates, key=lambda pair: (-pair[1], pair[0]))[:k]
+
+    def save(self, conn):
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.save(buffer, self.counts)
+        conn.executemany(
+            "INSERT OR REPLACE INTO title_sketches (name, data) VALUES (?, ?)",
+            [
+                ("count_min", buffer.getvalue()),
+                ("candidates", json.dumps(self.candidates).encode("utf-8")),
+            ],
+        )
+
+    @classmethod
+    def load(cls, conn):
+        import numpy as np
+
+        sketch = cls()
+        rows = dict(conn.execute("SELECT name, data FROM title_sketches"))
+        if "count_min" in rows:
+            sketch.counts = np.load(io.BytesIO(rows["count_min"]))
+        if "candidates" in rows:
+            sketch.candidates = json.loads(rows["candidates"])
+        return sketch
+
+
+def add_chats(conn, items):
+    """
+    Fold newly stored chats into the aggregates.
+
+    Runs inside the caller's transaction, so aggregates commit together with
+    the chats themselves. Items must not have been counted before.
+    """
+    items = list(items)
+    if not items:
+        return
+    volume = Counter()
+    for item in items:
+        assistant = item.get("AssistantName") or "Unknown"
+        for period_kind, length in ROLLUP_PERIODS.items():
+            volume[(period_kind, item["TimeStamp"][:length], assistant)] += 1
+    conn.executemany(
+        """
+        INSERT INTO chat_volume_rollup (period_kind, period, assistant, chats)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (period_kind, period, assistant) DO UPDATE SET chats = chats + excluded.chats
+        """,
+        ((kind, period, assistant, chats) for (kind, period, assistant), chats in volume.items()),
+    )
+
+    sketch = TitleSketch.load(conn)
+    sketch.add(normalize_title(item.get("ChatTitle")) for item in items)
+    sketch.save(conn)
+
+
+def rebuild(conn, page_size=10_000):
+    """Recompute all aggregates from the chats table."""
+    conn.execute("DELETE FROM chat_volume_rollup")
+    conn.execute("DELETE FROM title_sketches")
+    for period_kind, length in ROLLUP_PERIODS.items():
+        conn.execute(
+            f"""
+            INSERT INTO chat_volume_rollup (period_kind, period, assistant, chats)
+            SELECT ?, substr(TimeStamp, 1, {length}), COALESCE(NULLIF(AssistantName, ''), 'Unknown'), COUNT(*)
+            FROM chats
+            GROUP BY 2, 3
+            """,
+            (period_kind,),
+        )
+
+    sketch = TitleSketch()
+    cursor = conn.execute("SELECT ChatTitle FROM chats")
+    while True:
+        rows = cursor.fetchmany(page_size)
+        if not rows:
+            break
+        sketch.add(normalize_title(row[0]) for row in rows)
+    sketch.save(conn)
+
+
+def ensure_built(conn):
+    """Build the aggregates of a store that predates them, once."""
+    conn.executescript(SCHEMA)
+    if conn.execute("SELECT 1 FROM sync_state WHERE key = ?", (_BUILT_KEY,)).fetchone():
+        return
+    rebuild(conn)
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, '1')", (_BUILT_KEY,))
+    conn.commit()
+
+
+def top_titles(conn, k=20):
+    """Return the `k` most frequent titles seen so far as (title, count) pairs."""
+    return TitleSketch.load(conn).top(k)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Run against the offline stand-ins of fakes.py, never the real services
+os.environ.setdefault("CHATDB_FAKE_CLIENTS", "1")
+os.environ.setdefault("LLM_CACHE_BACKEND", "memory")
+os.environ.setdefault("CHANGE_FEED_ENABLED", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,26 @@
+import change_feed
+import local_store
+from fakes import FakeContainer, make_chat_documents
+
+
+def test_ensure_current_waits_for_a_draining_consumer(tmp_path, monkeypatch):
+    documents = make_chat_documents(2000)
+    container = FakeContainer(documents, page_latency=0.01)
+    consumer = change_feed.ChangeFeedConsumer(container, str(tmp_path), update_topics=False)
+    monkeypatch.setattr(change_feed, "_consumer", consumer)
+
+    def fail_sync(*args, **kwargs):
+        raise AssertionError("synced while the consumer was draining the feed")
+
+    monkeypatch.setattr(local_store, "sync", fail_sync)
+    messages = []
+    consumer.start()
+    conn = local_store.connect(str(tmp_path))
+    try:
+        assert change_feed.ensure_current(container, conn, on_progress=messages.append, wait_interval=0.01) == 0
+        assert change_feed.is_current()
+        assert local_store.count_entries(conn) == len(documents)
+        assert messages
+    finally:
+        consumer.stop()
+        conn.close()
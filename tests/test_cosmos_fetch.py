@@ -0,0 +1,34 @@
+import time
+from datetime import datetime
+import instrumentation
+from cosmos_fetch import iter_query_pages_parallel
+from fakes import FakeContainer, make_chat_documents
+
+QUERY = "SELECT c.id, c.TimeStamp FROM c WHERE c.TimeStamp >= '2023-01-01'"
+
+
+class SlowReadContainer(FakeContainer):
+    """Pauses after each page, so other readers overwrite the shared headers meanwhile."""
+
+    def _charge(self, page, etag=None, response_hook=None):
+        super()._charge(page, etag, response_hook)
+        time.sleep(0.005)
+
+
+def test_parallel_readers_record_the_charge_of_their_own_pages():
+    documents = make_chat_documents(1000, start=datetime(2023, 1, 1), days=100)
+    container = SlowReadContainer(documents, partitions=4)
+    with instrumentation.run("parallel") as run_id:
+        pages = iter_query_pages_parallel(container, QUERY, page_size=7, stage="parallel_query")
+        assert sum(len(page) for page, _ in pages) == 1000
+
+    recorded = [
+        event
+        for event in instrumentation.events([run_id])
+        if event["stage"] == "parallel_query.page"
+    ]
+    assert len(recorded) == container.page_count
+    assert [event["request_charge"] for event in recorded] == [
+        round(container.base_charge + container.charge_per_item * event["items"], 2)
+        for event in recorded
+    ]
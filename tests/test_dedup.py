@@ -0,0 +1,23 @@
+from dedup import cluster_near_duplicates, collapse_titles, format_title_groups
+
+
+def test_near_duplicate_titles_collapse_into_the_most_frequent_form():
+    titles = ["Draft NDA", "draft an NDA", "Draft NDA", "Plan a team offsite", "draft  NDA"]
+
+    groups = collapse_titles(titles)
+    assert groups == [("Draft NDA", 4), ("Plan a team offsite", 1)]
+    assert format_title_groups(groups) == ["Draft NDA (x4)", "Plan a team offsite"]
+
+
+def test_unrelated_titles_stay_apart():
+    titles = ["Draft NDA", "Draft SLA", "Review lease agreement", "Summarize quarterly sales"]
+
+    assert sorted(collapse_titles(titles)) == sorted((title, 1) for title in titles)
+    assert cluster_near_duplicates(["draft nda", "review lease agreement"]) == [0, 1]
+
+
+def test_clusters_point_at_their_seed():
+    texts = ["summarize board minutes", "plan team offsite", "summarize board minutes."]
+
+    assert cluster_near_duplicates(texts) == [0, 1, 0]
+    assert cluster_near_duplicates([]) == []
@@ -0,0 +1,47 @@
+import pytest
+import embeddings
+import jobs
+import local_store
+from fakes import FakeEncoder, make_chat_documents
+
+
+def test_cancelled_grouping_stops_embedding_between_pages(tmp_path):
+    conn = local_store.connect(str(tmp_path))
+    local_store.mark_changed(conn, local_store.upsert_items(conn, make_chat_documents(500)))
+    conn.commit()
+    job = jobs.Job(("semantic_groups",))
+    pages = []
+
+    def on_page(encoded):
+        # The session moved on to other chats after the first page
+        pages.append(encoded)
+        job.cancel()
+        job.update(message=f"Embedded {encoded} new chat titles...")
+
+    with pytest.raises(jobs.JobCancelled):
+        embeddings.embed_chats(conn, encoder=FakeEncoder(), page_size=100, on_page=on_page)
+    assert len(pages) == 1
+    # The committed page is kept and the rest is embedded on the next run
+    assert conn.execute("SELECT COUNT(*) FROM chat_embeddings").fetchone()[0] == 100
+    embeddings.embed_chats(conn, encoder=FakeEncoder(), page_size=100)
+    assert conn.execute("SELECT COUNT(*) FROM chat_embeddings").fetchone()[0] == 500
+
+
+def test_semantic_groups_report_stages(tmp_path):
+    conn = local_store.connect(str(tmp_path))
+    documents = make_chat_documents(300)
+    local_store.mark_changed(conn, local_store.upsert_items(conn, documents))
+    conn.commit()
+    stages = []
+
+    start, end = min(doc["TimeStamp"] for doc in documents), max(doc["TimeStamp"] for doc in documents)
+    groups = embeddings.semantic_groups(
+        conn,
+        start,
+        end,
+        n_clusters=5,
+        encoder=FakeEncoder(),
+        on_stage=lambda stage, progress, message: stages.append(stage),
+    )
+    assert stages[0] == "embed" and stages[-1] == "cluster"
+    assert sum(group["chats"] for group in groups) == 300
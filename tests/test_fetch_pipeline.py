@@ -0,0 +1,43 @@
+from datetime import datetime
+import chat_dataset
+import fetch_pipeline
+import local_store
+from fakes import make_chat_documents
+
+
+def _add_chats(conn, documents):
+    local_store.mark_changed(conn, local_store.upsert_items(conn, documents))
+    conn.commit()
+
+
+def _fetch(conn, request, builds):
+    key = chat_dataset.fetch_key(*request)
+    return chat_dataset.get_or_build(
+        key, fetch_pipeline.fetch_version(conn, request), lambda: builds.append(key) or key
+    )
+
+
+def test_cached_range_fetch_survives_writes_outside_the_range(tmp_path):
+    conn = local_store.connect(str(tmp_path))
+    _add_chats(conn, make_chat_documents(500, start=datetime(2023, 1, 1), days=365))
+    year = fetch_pipeline.FetchRequest(
+        "Year", "2023-01-01T00:00:00.000000Z", "2023-12-31T23:59:59.999999Z", None, None
+    )
+    latest = fetch_pipeline.FetchRequest("Number of Entries", None, None, 0, 100)
+    builds = []
+    _fetch(conn, year, builds)
+    _fetch(conn, latest, builds)
+
+    # A sync adds chats of the next year only
+    later = make_chat_documents(50, start=datetime(2024, 1, 1), days=30, seed=7)
+    for document in later:
+        document["id"] = "later-" + document["id"]
+    _add_chats(conn, later)
+
+    _fetch(conn, year, builds)
+    _fetch(conn, latest, builds)
+    assert builds == [
+        ("range", year.range_start, year.range_end),
+        ("latest", 0, 100, None),
+        ("latest", 0, 100, None),
+    ]
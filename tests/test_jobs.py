@@ -0,0 +1,105 @@
+import threading
+import time
+import jobs
+
+
+def _blocking(job, started, release):
+    started.set()
+    while not release.wait(0.01):
+        job.update()
+    return job.key
+
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if job.done:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"job {job.key} did not finish")
+
+
+def test_identical_key_joins_the_job_in_flight():
+    runner = jobs.JobRunner(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    first = runner.submit(("fetch", 1), _blocking, started, release, owner="a")
+    assert started.wait(5)
+    second = runner.submit(("fetch", 1), _blocking, started, release, owner="b")
+
+    assert second is first
+    assert first.owners == {"a", "b"}
+    release.set()
+    _wait(first)
+    assert first.state == jobs.DONE
+    assert first.result == ("fetch", 1)
+    assert runner.jobs() == []
+
+
+def test_job_is_cancelled_once_its_last_owner_releases_it():
+    runner = jobs.JobRunner(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    job = runner.submit(("fetch", 1), _blocking, started, release, owner="a")
+    runner.submit(("fetch", 1), _blocking, started, release, owner="b")
+    assert started.wait(5)
+
+    runner.release(job, "a")
+    assert not job.cancelled
+    runner.release(job, "b")
+    _wait(job)
+    assert job.state == jobs.CANCELLED
+    assert job.result is None
+    assert runner.jobs() == []
+
+
+def test_submitting_another_key_cancels_the_owners_previous_job():
+    runner = jobs.JobRunner(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    previous = runner.submit(("fetch", 1), _blocking, started, release, owner="a")
+    assert started.wait(5)
+
+    current = runner.submit(("fetch", 2), lambda job: "ok", owner="a")
+    _wait(previous)
+    _wait(current)
+    assert previous.state == jobs.CANCELLED
+    assert current.state == jobs.DONE
+
+    # A job still held by another owner keeps running
+    started.clear()
+    shared = runner.submit(("fetch", 3), _blocking, started, release, owner="a")
+    runner.submit(("fetch", 3), _blocking, started, release, owner="b")
+    assert started.wait(5)
+    runner.submit(("fetch", 4), lambda job: "ok", owner="a")
+    assert not shared.cancelled
+    release.set()
+    _wait(shared)
+    assert shared.state == jobs.DONE
+
+
+def test_cancelled_job_is_replaced_on_resubmit():
+    runner = jobs.JobRunner(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    job = runner.submit(("fetch", 1), _blocking, started, release, owner="a")
+    assert started.wait(5)
+    runner.release(job, "a")
+
+    again = runner.submit(("fetch", 1), lambda job: "ok", owner="a")
+    assert again is not job
+    _wait(again)
+    _wait(job)
+    assert job.state == jobs.CANCELLED
+    assert again.state == jobs.DONE
+
+
+def test_job_cancelled_inside_work_ends_cancelled_not_failed():
+    def work(job):
+        job.update("load", 0.5, "Loading")
+        job.cancel()
+        job.update("fit", 0.8, "Fitting")
+        return "unreachable"
+
+    job = jobs.JobRunner(max_workers=1).submit(("drift",), work)
+    _wait(job)
+    assert job.state == jobs.CANCELLED
+    assert job.stage == "load"
+    assert job.error is None
+    assert job.finished is not None
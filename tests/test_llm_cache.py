@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+import llm_cache
+from llm_cache import DiskCacheBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _backend(tmp_path, monkeypatch, ttl=60, max_entries=3):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=clock.time))
+    return DiskCacheBackend(str(tmp_path), ttl, max_entries), clock
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    cache, clock = _backend(tmp_path, monkeypatch)
+    cache.set("a", "answer")
+    clock.now += 60
+    assert cache.get("a") == "answer"
+
+    clock.now += 1
+    assert cache.get("a") is None
+    # Expired entries are dropped on the next write
+    cache.set("b", "other")
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    cache, clock = _backend(tmp_path, monkeypatch)
+    for key in "abc":
+        clock.now += 1
+        cache.set(key, key.upper())
+
+    # Reading "a" makes "b" the least recently used
+    clock.now += 1
+    assert cache.get("a") == "A"
+    clock.now += 1
+    cache.set("d", "D")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+
+
+def test_entries_are_shared_through_the_cache_directory(tmp_path, monkeypatch):
+    cache, _ = _backend(tmp_path, monkeypatch)
+    cache.set("a", "answer")
+
+    assert DiskCacheBackend(str(tmp_path), 60, 3).get("a") == "answer"
@@ -0,0 +1,145 @@
+import threading
+import change_feed
+import local_store
+from fakes import FakeContainer, make_chat_documents
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+
+
+def _rollup_total(conn):
+    return conn.execute(
+        "SELECT SUM(chats) FROM chat_volume_rollup WHERE period_kind = 'day'"
+    ).fetchone()[0]
+
+
+def test_sync_after_partial_change_feed_pulls_older_chats(tmp_path):
+    documents = make_chat_documents(2000)
+    container = FakeContainer(documents)
+    conn = local_store.connect(str(tmp_path))
+
+    # The consumer commits its first feed page, which holds chats of any
+    # TimeStamp, before the sync runs
+    pager = container.query_items_change_feed(max_item_count=100, start_time="Beginning").by_page()
+    added = local_store.upsert_items(conn, list(next(iter(pager))))
+    local_store.mark_changed(conn, added)
+    local_store.set_state(conn, change_feed.CHECKPOINT_KEY, pager.continuation_token)
+    conn.commit()
+
+    local_store.sync(container, conn, force=True)
+
+    assert _count(conn) == len(documents)
+    assert _rollup_total(conn) == len(documents)
+
+
+def test_concurrent_sync_and_change_feed_count_chats_once(tmp_path):
+    documents = make_chat_documents(5000)
+    container = FakeContainer(documents, page_latency=0.002)
+    local_store.connect(str(tmp_path)).close()
+
+    def run_sync():
+        conn = local_store.connect(str(tmp_path))
+        try:
+            local_store.sync(container, conn, force=True, page_size=200)
+        finally:
+            conn.close()
+
+    def run_feed():
+        conn = local_store.connect(str(tmp_path))
+        try:
+            change_feed.consume(container, conn, page_size=200)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=run_sync), threading.Thread(target=run_feed)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = local_store.connect(str(tmp_path))
+    assert _count(conn) == len(documents)
+    assert _rollup_total(conn) == len(documents)
+    assert local_store.count_entries(conn) == len(documents)
+
+
+def test_entry_count_tracks_new_chats_only(tmp_path):
+    documents = make_chat_documents(300)
+    conn = local_store.connect(str(tmp_path))
+    local_store.mark_changed(conn, local_store.upsert_items(conn, documents[:200]))
+    conn.commit()
+
+    # Redelivered chats, e.g. edits on the change feed, are not counted again
+    added = local_store.upsert_items(conn, documents[100:])
+    local_store.mark_changed(conn, added)
+    conn.commit()
+
+    assert added == 100
+    assert local_store.count_entries(conn) == _count(conn) == len(documents)
+
+
+def test_sync_does_not_hold_the_write_lock_across_cosmos_reads(tmp_path):
+    documents = make_chat_documents(2000)
+    container = FakeContainer(documents, page_latency=0.2)
+    local_store.connect(str(tmp_path)).close()
+    errors = []
+    first_page = threading.Event()
+
+    def run_sync():
+        conn = local_store.connect(str(tmp_path))
+        try:
+            local_store.sync(container, conn, force=True, page_size=100, on_page=lambda _: first_page.set())
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=run_sync)
+    thread.start()
+    # A concurrent writer with a short busy timeout gets the lock between pages
+    conn = local_store.connect(str(tmp_path))
+    conn.execute("PRAGMA busy_timeout = 500")
+    extra = make_chat_documents(5, seed=7)
+    for document in extra:
+        document["id"] = "extra-" + document["id"]
+    first_page.wait()
+    try:
+        local_store.mark_changed(conn, local_store.upsert_items(conn, extra))
+        conn.commit()
+    except Exception as e:
+        errors.append(e)
+    thread.join()
+
+    assert not errors
+    assert _count(conn) == len(documents) + len(extra)
+    assert local_store.count_entries(conn) == len(documents) + len(extra)
+
+
+def test_seek_and_query_page_match_an_offset_query(tmp_path):
+    conn = local_store.connect(str(tmp_path))
+    documents = make_chat_documents(1000)
+    # Chats sharing a TimeStamp are ordered by id
+    documents[11]["TimeStamp"] = documents[10]["TimeStamp"]
+    local_store.mark_changed(conn, local_store.upsert_items(conn, documents))
+    conn.commit()
+
+    for start_offset in (0, 1, 99, 100, 457, 999, 1000, 1200):
+        expected = [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM chats ORDER BY TimeStamp DESC, id DESC LIMIT 50 OFFSET ?",
+                (start_offset,),
+            )
+        ]
+        rows, token = local_store.query_page(conn, local_store.seek(conn, start_offset), 50)
+        assert [row["id"] for row in rows] == expected
+
+        # The next page continues right after it
+        if token is not None:
+            next_rows, _ = local_store.query_page(conn, token, 50)
+            assert [row["id"] for row in next_rows] == [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM chats ORDER BY TimeStamp DESC, id DESC LIMIT 50 OFFSET ?",
+                    (start_offset + 50,),
+                )
+            ]
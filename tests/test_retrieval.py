@@ -0,0 +1,26 @@
+from retrieval import BM25Index, build_index
+
+
+def test_search_ranks_matching_titles_first():
+    index = BM25Index(
+        ["Draft NDA for vendor", "Review lease agreement", "NDA template", "Plan team offsite"],
+        payloads=["vendor-nda", "lease", "nda", "offsite"],
+    )
+
+    results = index.search("nda")
+    assert [payload for payload, _ in results] == ["nda", "vendor-nda"]
+    assert results[0][1] > results[1][1] > 0
+    assert [payload for payload, _ in index.search("nda", k=1)] == ["nda"]
+
+
+def test_search_without_known_terms_returns_nothing():
+    index = BM25Index(["Draft NDA", "Review lease agreement"])
+
+    assert index.search("quarterly forecast") == []
+    assert index.search("the") == []
+
+
+def test_build_index_skips_stopword_only_titles():
+    assert build_index([("the", 3), ("and of", 1)]) is None
+    index = build_index([("Draft NDA", 4), ("Review lease", 1)])
+    assert [payload for payload, _ in index.search("lease")] == [("Review lease", 1)]
@@ -0,0 +1,28 @@
+import pytest
+import jobs
+import local_store
+import topic_drift
+from fakes import make_chat_documents
+
+
+def test_cancelled_drift_computation_stops_before_labeling(tmp_path, monkeypatch):
+    conn = local_store.connect(str(tmp_path))
+    local_store.mark_changed(conn, local_store.upsert_items(conn, make_chat_documents(500)))
+    conn.commit()
+    job = jobs.Job(("topic_drift", "2023"))
+    fit_topics = topic_drift.fit_topics
+
+    def fit_then_cancel(titles):
+        # The session moved on to another year while the model was fitted
+        job.cancel()
+        return fit_topics(titles)
+
+    def label_topics(topics, sample_titles):
+        raise AssertionError("labeled the topics of a cancelled job")
+
+    monkeypatch.setattr(topic_drift, "fit_topics", fit_then_cancel)
+    monkeypatch.setattr(topic_drift, "label_topics", label_topics)
+    start, end = topic_drift.year_range("2023")
+    with pytest.raises(jobs.JobCancelled):
+        topic_drift.compute_drift(conn, start, end, on_stage=job.update)
+    assert job.stage == "fit"
@@ -0,0 +1,21 @@
+import local_store
+from fakes import FakeContainer, make_chat_documents
+from topic_engine import TopicEngine
+
+
+def test_update_from_store_feeds_chats_stored_out_of_timestamp_order(tmp_path):
+    # The change feed lists chats in the order they were written, not by TimeStamp
+    feed = FakeContainer(make_chat_documents(3000)).feed
+    conn = local_store.connect(str(tmp_path))
+    engine = TopicEngine(n_components=5)
+
+    local_store.upsert_items(conn, feed[:1000])
+    conn.commit()
+    assert engine.update_from_store(conn) == 1000
+
+    local_store.upsert_items(conn, feed[1000:])
+    # Redelivered chats keep their place and are not fed again
+    local_store.upsert_items(conn, feed[:10])
+    conn.commit()
+    assert engine.update_from_store(conn) == 2000
+    assert engine.n_documents == 3000
@@ -0,0 +1,52 @@
+import threading
+import time
+import numpy as np
+import local_store
+import topic_index
+from fakes import make_chat_documents
+
+
+class SlowEngine:
+    """Engine stand-in whose transform takes a while, like a large model."""
+
+    def __init__(self, transformed):
+        self.transformed = transformed
+
+    def transform(self, titles):
+        self.transformed.set()
+        time.sleep(0.3)
+        return np.ones((len(titles), 3), dtype=np.float32)
+
+
+def test_index_chats_does_not_hold_the_write_lock_while_transforming(tmp_path):
+    conn = local_store.connect(str(tmp_path))
+    local_store.mark_changed(conn, local_store.upsert_items(conn, make_chat_documents(500)))
+    conn.commit()
+    transformed = threading.Event()
+    errors = []
+
+    def run_index():
+        index_conn = local_store.connect(str(tmp_path))
+        try:
+            topic_index.index_chats(SlowEngine(transformed), index_conn, page_size=100)
+        finally:
+            index_conn.close()
+
+    thread = threading.Thread(target=run_index)
+    thread.start()
+    transformed.wait()
+    time.sleep(0.35)
+    # The first page is stored; a writer with a short busy timeout still gets in
+    conn.execute("PRAGMA busy_timeout = 200")
+    extra = make_chat_documents(5, seed=7)
+    for document in extra:
+        document["id"] = "extra-" + document["id"]
+    try:
+        local_store.mark_changed(conn, local_store.upsert_items(conn, extra))
+        conn.commit()
+    except Exception as e:
+        errors.append(e)
+    thread.join()
+
+    assert not errors
+    assert conn.execute("SELECT COUNT(*) FROM chat_topics").fetchone()[0] >= 500
@@ -0,0 +1,48 @@
+import trend_analysis
+from trend_analysis import chunk_titles, estimate_tokens
+
+
+def test_chunks_keep_order_and_fit_the_budget():
+    titles = [f"title {i:03d}" for i in range(50)]
+    budget = 4 * estimate_tokens(titles[0])
+
+    chunks = chunk_titles(titles, budget)
+    assert [title for chunk in chunks for title in chunk] == titles
+    assert all(sum(estimate_tokens(title) for title in chunk) <= budget for chunk in chunks)
+    assert [len(chunk) for chunk in chunks[:-1]] == [4] * (len(chunks) - 1)
+    assert chunk_titles([], budget) == []
+
+
+def test_oversized_title_gets_a_chunk_of_its_own():
+    titles = ["short", "x" * 400, "short"]
+
+    assert chunk_titles(titles, token_budget=10) == [["short"], ["x" * 400], ["short"]]
+
+
+def test_summaries_are_merged_in_rounds_until_they_fit_one_prompt(monkeypatch):
+    prompts = []
+
+    def complete(content, temperature=0.7):
+        prompts.append(content)
+        return f"merged {len(prompts)} " + "x" * 200
+
+    monkeypatch.setattr(trend_analysis, "_complete", complete)
+    summaries = [f"summary {i} " + "x" * 200 for i in range(8)]
+
+    # Every summary fills a prompt on its own, so they are merged pairwise
+    remaining = trend_analysis._reduce_summaries(summaries, token_budget=60, max_parallel=2)
+    assert remaining == ["merged 7 " + "x" * 200]
+    assert len(prompts) == 4 + 2 + 1
+    # Prompts of one round are sent in parallel, so match pairs in any order
+    assert all(
+        any(summaries[i] in prompt and summaries[i + 1] in prompt for prompt in prompts[:4])
+        for i in range(0, 8, 2)
+    )
+
+
+def test_summaries_that_fit_are_left_for_the_final_merge(monkeypatch):
+    monkeypatch.setattr(trend_analysis, "_complete", lambda content, temperature=0.7: 1 / 0)
+
+    summaries = ["one", "two", "three"]
+    assert trend_analysis._reduce_summaries(summaries, token_budget=100, max_parallel=2) == summaries
+    assert trend_analysis._reduce_summaries(["only"], token_budget=1, max_parallel=2) == ["only"]
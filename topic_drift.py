@@ -0,0 +1,333 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from cloud_config import (
+    TOPIC_DRIFT_CACHE_ENTRIES,
+    TOPIC_DRIFT_COMPONENTS,
+    TOPIC_DRIFT_REFRESH_INTERVAL,
+    get_llm_client,
+)
+from instrumentation import measure, timed
+from preprocessor import preprocess_titles
+from topic_index import PERIODS, TopicAssignments, group_topics, period_starts
+from topicmodelling_dev import format_topic_analysis
+import local_store
+import results_store
+
+# Granularities offered for drift charts; day is computed too but is noisy
+DRIFT_PERIODS = ("week", "month", "quarter")
+
+# Process-wide LRU of (range version, computed at, drift) per range, so
+# reruns and other sessions reuse the drift of unchanged chats
+_drift_cache = OrderedDict()
+_drift_cache_lock = threading.Lock()
+
+
+def year_range(year):
+    """Return the TimeStamp range covering a year."""
+    return f"{year}-01-01T00:00:00.000000Z", f"{year}-12-31T23:59:59.999999Z"
+
+
+@timed("fit_topic_drift")
+def fit_topics(titles, n_topics=TOPIC_DRIFT_COMPONENTS, max_top_words=10):
+    """
+    Fit one TF-IDF/NMF model over all titles.
+
+    The model is fitted on the distinct preprocessed titles and every title
+    gets the topic weights of its distinct form. Returns (topics, weights)
+    with topics structured like those of `extract_topics_from_text` and
+    weights an (n_titles, n_topics) array, or (None, None) if the titles are
+    too few to model.
+    """
+    import numpy as np
+    from sklearn.decomposition import NMF
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    positions = {}
+    inverse = np.fromiter(
+        (positions.setdefault(title, len(positions)) for title in preprocess_titles(titles)),
+        dtype=np.intp,
+        count=len(titles),
+    )
+    distinct = list(positions)
+
+    vectorizer = TfidfVectorizer(
+        stop_words="english",
+        max_df=0.85,
+        min_df=2,
+        ngram_range=(1, 2),
+        max_features=5000,
+    )
+    try:
+        tfidf = vectorizer.fit_transform(distinct)
+    except ValueError as e:
+        # Raised when no term is left after pruning
+        logging.warning(f"Not enough titles for topic drift: {e}")
+        return None, None
+    if tfidf.shape[1] < 2:
+        logging.warning("Not enough features extracted for topic drift")
+        return None, None
+
+    nmf = NMF(
+        n_components=min(n_topics, tfidf.shape[1] - 1),
+        random_state=42,
+        max_iter=500,
+        l1_ratio=0.5,
+    )
+    with measure("nmf_fit", documents=tfidf.shape[0], features=tfidf.shape[1]):
+        distinct_weights = nmf.fit_transform(tfidf)
+    weights = distinct_weights.astype(np.float32)[inverse]
+
+    feature_names = vectorizer.get_feature_names_out()
+    totals = weights.sum(axis=0)
+    topics = []
+    for topic_idx, component in enumerate(nmf.components_):
+        top_features_ind = component.argsort()[: -max_top_words - 1 : -1]
+        term_weights = component[top_features_ind] / component[top_features_ind].sum()
+        topics.append(
+            {
+                "topic": f"Topic {topic_idx + 1}",
+                "score": float(totals[topic_idx] / max(totals.sum(), 1e-12)),
+                "keywords": [
+                    {"term": feature_names[i], "weight": float(weight)}
+                    for i, weight in zip(top_features_ind, term_weights)
+                ],
+            }
+        )
+    return topics, weights
+
+
+def label_topics(topics, sample_titles):
+    """
+    Name all topics with a single LLM call.
+
+    Adds "label" and "description" to each topic, in place. Topics the model
+    did not label are named after their top keywords.
+    """
+    labels = []
+    try:
+        prompt = f"""
+        The following {len(topics)} topics were extracted from the chat titles of an AI-assisted legal chatbot.
+
+        Sample chat titles:
+        {chr(10).join(sample_titles[:50])}
+
+        Extracted topics:
+        {format_topic_analysis(topics)}
+
+        Return a JSON array with exactly one object per topic, in the same order, with the following structure:
+        [
+            {{
+                "label": "Clear topic name",
+                "description": "Brief 1-sentence description of the topic"
+            }},
+            ...
+        ]
+
+        Ensure your response can be parsed as valid JSON. Return ONLY the JSON array and nothing else.
+        """
+        response = get_llm_client().chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a topic analysis expert who names topics consistently and returns them in valid JSON format.",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.3,
+        )
+        content = response.choices[0].message.content
+        match = re.search(r"\[[\s\S]*\]", content)
+        labels = json.loads(match.group(0) if match else content)
+        if len(labels) != len(topics):
+            logging.warning(f"Got {len(labels)} labels for {len(topics)} drift topics")
+    except Exception as e:
+        logging.error(f"Error labeling drift topics: {e}")
+
+    seen = set()
+    for i, topic in enumerate(topics):
+        named = labels[i] if i < len(labels) and isinstance(labels[i], dict) else {}
+        label = str(named.get("label") or "").strip() or ", ".join(
+            keyword["term"] for keyword in topic["keywords"][:3]
+        )
+        # Labels name chart series, so they must be unique
+        unique_label, suffix = label, 2
+        while unique_label in seen:
+            unique_label, suffix = f"{label} ({suffix})", suffix + 1
+        seen.add(unique_label)
+        topic["label"] = unique_label
+        topic["description"] = str(named.get("description") or "")
+    return topics
+
+
+def topic_shares(timestamps, weights, period):
+    """
+    Return (period_starts, chats, shares) for one granularity.
+
+    shares[i, k] is topic k's share of the topic weight of the chats in
+    period i.
+    """
+    import numpy as np
+
+    periods, codes, chats = np.unique(
+        period_starts(timestamps, period), return_inverse=True, return_counts=True
+    )
+    assignments = TopicAssignments(
+        ids=None,
+        timestamps=timestamps,
+        assistants=None,
+        assistant_codes=None,
+        topics=weights.argmax(axis=1),
+        weights=weights,
+    )
+    totals = group_topics(codes, len(periods), assignments, weighted=True)
+    row_sums = totals.sum(axis=1, keepdims=True)
+    shares = np.divide(totals, row_sums, out=np.zeros_like(totals), where=row_sums > 0)
+    return periods, chats, shares
+
+
+def compute_drift(conn, start_date_str, end_date_str, on_stage=None):
+    """
+    Fit topics over a TimeStamp range and compute their share per period.
+
+    Returns a JSON-serializable dict with the labeled "topics" and, per
+    period of `topic_index.PERIODS`, the period "starts", the number of
+    "chats" and the topic "shares". `on_stage` is called as
+    `on_stage(stage, progress, message)` before each stage and may raise to
+    stop the computation, as `jobs.Job.update` does once cancelled.
+    """
+    import numpy as np
+
+    def stage(name, progress, message):
+        if on_stage:
+            on_stage(name, progress, message)
+
+    timestamps = []
+    titles = []
+    stage("load", 0.0, "Loading chat titles...")
+    for page in local_store.iter_range_pages(conn, start_date_str, end_date_str):
+        timestamps.extend(item["TimeStamp"][:19] for item in page)
+        titles.extend(item["ChatTitle"][:100] for item in page)
+
+    drift = {"topics": [], "periods": {}}
+    if not titles:
+        return drift
+    stage("fit", 0.2, f"Fitting topics of {len(titles)} chats...")
+    topics, weights = fit_topics(titles)
+    if topics is None:
+        return drift
+
+    stage("label", 0.7, "Labeling topics...")
+    drift["topics"] = label_topics(topics, list(dict.fromkeys(titles)))
+    stage("shares", 0.9, "Computing topic shares...")
+    timestamps = np.array(timestamps, dtype="datetime64[s]")
+    for period in PERIODS:
+        starts, chats, shares = topic_shares(timestamps, weights, period)
+        drift["periods"][period] = {
+            "starts": np.datetime_as_string(starts).tolist(),
+            "chats": chats.tolist(),
+            "shares": np.round(shares.astype(float), 4).tolist(),
+        }
+    return drift
+
+
+def peek_drift(start_date_str, end_date_str, conn=None):
+    """
+    Return the memoized drift of a TimeStamp range, or None if it needs
+    computing. Cheap enough to call on every rerun.
+
+    A drift is served while the range's version (see
+    `local_store.range_version`) is unchanged. Ranges still receiving chats
+    are refit at most every TOPIC_DRIFT_REFRESH_INTERVAL seconds, so a live
+    feed does not cost a fit and a labeling call per new chat.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = local_store.connect()
+    try:
+        version = local_store.range_version(conn, start_date_str, end_date_str)
+    finally:
+        if own_conn:
+            conn.close()
+
+    key = (start_date_str, end_date_str)
+    with _drift_cache_lock:
+        entry = _drift_cache.get(key)
+        if entry is None:
+            return None
+        cached_version, computed_at, drift = entry
+        if cached_version != version and time.time() - computed_at > TOPIC_DRIFT_REFRESH_INTERVAL:
+            return None
+        _drift_cache.move_to_end(key)
+        return drift
+
+
+def get_drift(start_date_str, end_date_str, on_stage=None):
+    """
+    Return the topic drift of a TimeStamp range, computing it if needed.
+
+    Memoized drifts are served as described in `peek_drift`. Otherwise a
+    result precomputed by precompute.py is served if the range's chats are
+    unchanged, or the drift is computed, reporting to `on_stage` (see
+    `compute_drift`).
+    """
+    store = local_store.connect()
+    try:
+        drift = peek_drift(start_date_str, end_date_str, store)
+        if drift is not None:
+            return drift
+
+        version = local_store.range_version(store, start_date_str, end_date_str)
+        drift = results_store.get_result(
+            store,
+            "topic_drift",
+            start_date_str,
+            end_date_str,
+            results_store.range_fingerprint(store, start_date_str, end_date_str),
+        )
+        if drift is None:
+            drift = compute_drift(store, start_date_str, end_date_str, on_stage)
+    finally:
+        store.close()
+
+    with _drift_cache_lock:
+        _drift_cache[(start_date_str, end_date_str)] = (version, time.time(), drift)
+        _drift_cache.move_to_end((start_date_str, end_date_str))
+        while len(_drift_cache) > TOPIC_DRIFT_CACHE_ENTRIES:
+            _drift_cache.popitem(last=False)
+    return drift
+
+
+def run_drift_job(job, year):
+    """Job computing the topic drift of a year, stopping between stages once cancelled."""
+    job.update("topic_drift", 0.0, f"Computing the topic drift of {year}...")
+    return get_year_drift(year, on_stage=job.update)
+
+
+def get_year_drift(year, on_stage=None):
+    """Return the topic drift of a year, see `get_drift`."""
+    return get_drift(*year_range(year), on_stage=on_stage)
+
+
+def top_topics(drift, period, period_start, k=None):
+    """
+    Rank the topics of one period by their share.
+
+    `period_start` is a "%Y-%m-%d" date as returned by
+    `topic_index.period_starts`. Returns a list of dicts with "label",
+    "description" and "share", empty if the period has no chats.
+    """
+    table = drift["periods"].get(period)
+    if not table or period_start not in table["starts"]:
+        return []
+    shares = table["shares"][table["starts"].index(period_start)]
+    ranked = sorted(zip(drift["topics"], shares), key=lambda pair: pair[1], reverse=True)
+    return [
+        {"label": topic["label"], "description": topic["description"], "share": share}
+        for topic, share in ranked[:k]
+        if share > 0
+    ]
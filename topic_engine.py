@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+from cloud_config import (
+    FETCH_PAGE_SIZE,
+    TOPIC_MODEL_COMPONENTS,
+    TOPIC_MODEL_DIR,
+    TOPIC_MODEL_FEATURES,
+)
+from instrumentation import measure
+from topicmodelling_dev import (
+    extract_topics_from_text,
+    format_topic_analysis,
+    interpret_topics_with_llm,
+)
+import local_store
+import topic_index
+
+MODEL_FILENAME = "topic_model.joblib"
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class TopicEngine:
+    """
+    Topic model that is updated incrementally and persisted between runs.
+
+    Titles are vectorized with a stateless HashingVectorizer and fed to
+    MiniBatchNMF.partial_fit, so new chats extend the model without refitting
+    on the whole history. Topic keywords for any set of titles are obtained by
+    transforming them against the fitted components.
+    """
+
+    def __init__(self, n_components=TOPIC_MODEL_COMPONENTS, n_features=TOPIC_MODEL_FEATURES):
+        from sklearn.decomposition import MiniBatchNMF
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            stop_words="english",
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm="l2",
+        )
+        self.nmf = MiniBatchNMF(
+            n_components=n_components, batch_size=1024, random_state=42
+        )
+        # Hashed feature index -> term, since hashing keeps no vocabulary
+        self.terms = {}
+        # Rowid of the last local store chat fed to the model. Chats arrive
+        # from the change feed in any TimeStamp order, so a TimeStamp
+        # watermark would skip older chats stored later.
+        self.last_rowid = 0
+        self.n_documents = 0
+
+    @property
+    def is_fitted(self):
+        return self.n_documents >= self.nmf.n_components
+
+    def _record_terms(self, titles):
+        from sklearn.utils import murmurhash3_32
+
+        analyzer = self.vectorizer.build_analyzer()
+        n_features = self.vectorizer.n_features
+        for term in {term for title in titles for term in analyzer(title)}:
+            self.terms.setdefault(abs(murmurhash3_32(term)) % n_features, term)
+
+    def partial_fit(self, titles):
+        """Update the model with a batch of chat titles."""
+        titles = [title for title in titles if title and title.strip()]
+        if not titles:
+            return
+        self._record_terms(titles)
+        with measure("nmf_partial_fit", documents=len(titles)):
+            self.nmf.partial_fit(self.vectorizer.transform(titles))
+        self.n_documents += len(titles)
+
+    def update_from_store(self, conn, page_size=FETCH_PAGE_SIZE):
+        """Feed the chats stored since the last update to the model."""
+        updated = 0
+        # Models persisted before rowids were tracked start over from the
+        # first chat
+        last_rowid = getattr(self, "last_rowid", 0)
+        for page in local_store.iter_pages_after(conn, last_rowid, page_size):
+            self.partial_fit([item["ChatTitle"] for item in page])
+            last_rowid = self.last_rowid = page[-1]["rowid"]
+            updated += len(page)
+        return updated
+
+    def transform(self, titles):
+        """Return the (n_titles, n_components) topic weights of the titles."""
+        # Chat titles repeat heavily; solve each distinct title only once
+        positions = {}
+        inverse = [positions.setdefault(title, len(positions)) for title in titles]
+        weights = self.nmf.transform(self.vectorizer.transform(list(positions)))
+        return weights[inverse]
+
+    def topic_keywords(self, topic_idx, max_top_words=10):
+        """Return the top terms of a topic with their normalized weights."""
+        import numpy as np
+
+        component = self.nmf.components_[topic_idx]
+        candidates = np.argpartition(component, -max_top_words)[-max_top_words:]
+        top_features_ind = candidates[np.argsort(component[candidates])[::-1]]
+        top_features_ind = [i for i in top_features_ind if i in self.terms]
+
+        weights = component[top_features_ind]
+        if weights.sum() == 0:
+            return []
+        weights = weights / weights.sum()
+        return [
+            {"term": self.terms[i], "weight": float(weight)}
+            for i, weight in zip(top_features_ind, weights)
+        ]
+
+    def topics_for_titles(self, titles, max_topics=5, max_top_words=10):
+        """
+        Return the most prominent topics of the titles with their keywords.
+
+        The result has the same structure as the topics built in
+        `extract_topics_from_text`; "score" is the topic's share of the
+        titles' total topic weight.
+        """
+        import numpy as np
+
+        shares = self.transform(titles).sum(axis=0)
+        if shares.sum() == 0:
+            return []
+        shares = shares / shares.sum()
+
+        topics = []
+        for topic_idx in np.argsort(shares)[::-1][:max_topics]:
+            keywords = self.topic_keywords(topic_idx, max_top_words)
+            if not keywords:
+                continue
+            topics.append(
+                {
+                    "topic": f"Topic {topic_idx + 1}",
+                    "score": float(shares[topic_idx]),
+                    "keywords": keywords,
+                }
+            )
+        return topics
+
+    def save(self, model_dir=TOPIC_MODEL_DIR):
+        """Persist the model, replacing the previous copy atomically."""
+        import joblib
+
+        os.makedirs(model_dir, exist_ok=True)
+        path = os.path.join(model_dir, MODEL_FILENAME)
+        joblib.dump(self, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, model_dir=TOPIC_MODEL_DIR):
+        """Load the persisted model, or return a new one if none exists."""
+        import joblib
+
+        path = os.path.join(model_dir, MODEL_FILENAME)
+        if os.path.exists(path):
+            try:
+                return joblib.load(path)
+            except Exception as e:
+                logging.error(f"Error loading topic model, starting afresh: {e}")
+        return cls()
+
+
+def get_engine():
+    """Return the process-wide topic engine, loading it from disk once."""
+    global _engine
+    if _engine is None:
+        _engine = TopicEngine.load()
+    return _engine
+
+
+def update_engine(conn):
+    """
+    Bring the shared engine up to date with the local store and persist it.
+
+    Chats that are new to the per-title topic index are assigned as well.
+    """
+    with _engine_lock:
+        engine = get_engine()
+        updated = engine.update_from_store(conn)
+        if updated:
+            engine.save()
+            logging.info(f"Topic model updated with {updated} chats")
+        if engine.is_fitted:
+            topic_index.index_chats(engine, conn)
+        return engine
+
+
+def extract_topics(chat_titles, conn, max_topics=5, max_top_words=10):
+    """
+    Extract and interpret topics of the given titles with the persisted model.
+
+    Returns None if the model has not seen enough chats yet, in which case
+    callers should fall back to `extract_topics_from_text`.
+    """
+    try:
+        engine = update_engine(conn)
+        if not engine.is_fitted:
+            return None
+        with _engine_lock:
+            topics = engine.topics_for_titles(chat_titles, max_topics, max_top_words)
+        if not topics:
+            return []
+        return interpret_topics_with_llm(
+            "\n".join(chat_titles), format_topic_analysis(topics)
+        )
+    except Exception as e:
+        logging.error(f"Error extracting topics with the topic engine: {e}")
+        return None
+
+
+def extract_window_topics(chat_titles, distinct_titles_text, conn=None):
+    """
+    Extract topics of fetched titles, falling back to fitting NMF on the
+    distinct preprocessed titles while the persisted model is not ready.
+
+    Opens its own local store connection unless `conn` is given, so it can run
+    on a worker thread.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = local_store.connect()
+    try:
+        topics = extract_topics(chat_titles, conn)
+    finally:
+        if own_conn:
+            conn.close()
+    if topics is None:
+        topics = extract_topics_from_text(
+            distinct_titles_text, cleaned_text=distinct_titles_text
+        )
+    return topics
@@ -0,0 +1,184 @@
+import logging
+from collections import namedtuple
+from cloud_config import FETCH_PAGE_SIZE
+
+# Dominant topic and full topic weights of every chat, keyed by the chat id of
+# the local store. topic is -1 for titles with no topic weight at all.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_topics (
+    id TEXT PRIMARY KEY,
+    topic INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    weights BLOB NOT NULL
+);
+"""
+
+PERIODS = ("day", "week", "month", "quarter")
+
+TopicAssignments = namedtuple(
+    "TopicAssignments",
+    ["ids", "timestamps", "assistants", "assistant_codes", "topics", "weights"],
+)
+
+
+def index_chats(engine, conn, page_size=FETCH_PAGE_SIZE, rebuild=False):
+    """
+    Store the topic assignment of every chat not yet in the index.
+
+    Each title is transformed on its own, so every chat is linked to its
+    dominant topic. Existing assignments are kept unless `rebuild` is set,
+    which recomputes them against the current model. Each page is committed
+    on its own, so the write lock is not held while titles are transformed;
+    an interrupted run resumes with the chats still missing. Returns the
+    number of chats indexed.
+    """
+    import numpy as np
+
+    conn.executescript(SCHEMA)
+    if rebuild:
+        conn.execute("DELETE FROM chat_topics")
+        conn.commit()
+
+    indexed = 0
+    last_rowid = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT c.rowid, c.id, c.ChatTitle
+            FROM chats c
+            LEFT JOIN chat_topics t ON t.id = c.id
+            WHERE t.id IS NULL AND c.rowid > ?
+            ORDER BY c.rowid
+            LIMIT ?
+            """,
+            (last_rowid, page_size),
+        ).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        weights = np.asarray(engine.transform([row[2] or "" for row in rows]), dtype=np.float32)
+        topics = weights.argmax(axis=1)
+        topics[weights.max(axis=1) == 0] = -1
+        conn.executemany(
+            "INSERT OR REPLACE INTO chat_topics (id, topic, weight, weights) VALUES (?, ?, ?, ?)",
+            (
+                (row[1], int(topic), float(chat_weights.max()), chat_weights.tobytes())
+                for row, topic, chat_weights in zip(rows, topics, weights)
+            ),
+        )
+        conn.commit()
+        indexed += len(rows)
+
+    if indexed:
+        logging.info(f"Indexed topics of {indexed} chats")
+    return indexed
+
+
+def load_assignments(conn, start_date_str=None, end_date_str=None):
+    """Load the topic index, optionally limited to a TimeStamp range, as arrays."""
+    import numpy as np
+
+    conn.executescript(SCHEMA)
+    query = """
+        SELECT c.id, substr(c.TimeStamp, 1, 19), c.AssistantName, t.topic, t.weights
+        FROM chat_topics t
+        JOIN chats c ON c.id = t.id
+    """
+    params = ()
+    if start_date_str is not None and end_date_str is not None:
+        query += " WHERE c.TimeStamp BETWEEN ? AND ?"
+        params = (start_date_str, end_date_str)
+    rows = conn.execute(query, params).fetchall()
+
+    if not rows:
+        return TopicAssignments(
+            ids=np.array([], dtype=object),
+            timestamps=np.array([], dtype="datetime64[s]"),
+            assistants=np.array([], dtype=object),
+            assistant_codes=np.array([], dtype=np.intp),
+            topics=np.array([], dtype=np.intp),
+            weights=np.zeros((0, 0), dtype=np.float32),
+        )
+
+    ids, timestamps, assistant_names, topics, weights = zip(*rows)
+    assistants, assistant_codes = np.unique(
+        np.array([name or "" for name in assistant_names], dtype=object),
+        return_inverse=True,
+    )
+    return TopicAssignments(
+        ids=np.array(ids, dtype=object),
+        timestamps=np.array(timestamps, dtype="datetime64[s]"),
+        assistants=assistants,
+        assistant_codes=assistant_codes,
+        topics=np.array(topics, dtype=np.intp),
+        weights=np.frombuffer(b"".join(weights), dtype=np.float32).reshape(len(rows), -1),
+    )
+
+
+def period_starts(timestamps, period):
+    """Truncate datetime64 timestamps to the start of their day/week/month/quarter."""
+    import numpy as np
+
+    if period == "day":
+        return timestamps.astype("datetime64[D]")
+    if period == "week":
+        days = timestamps.astype("datetime64[D]")
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    if period == "month":
+        return timestamps.astype("datetime64[M]").astype("datetime64[D]")
+    if period == "quarter":
+        months = timestamps.astype("datetime64[M]")
+        return (months - months.astype(np.int64) % 3).astype("datetime64[D]")
+    raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+
+
+def group_topics(group_codes, n_groups, assignments, weighted):
+    """
+    Sum topics over groups of chats, `group_codes` giving each chat's group.
+
+    Returns an (n_groups, n_topics) matrix of dominant-topic counts, or of
+    summed topic weights if `weighted` is set, the latter as one sparse
+    group-by-chat indicator product.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    n_topics = assignments.weights.shape[1]
+    if weighted:
+        indicator = sparse.csr_matrix(
+            (
+                np.ones(len(group_codes), dtype=np.float32),
+                (group_codes, np.arange(len(group_codes))),
+            ),
+            shape=(n_groups, len(group_codes)),
+        )
+        return np.asarray(indicator @ assignments.weights)
+
+    valid = assignments.topics >= 0
+    flat = group_codes[valid] * n_topics + assignments.topics[valid]
+    return np.bincount(flat, minlength=n_groups * n_topics).reshape(n_groups, n_topics)
+
+
+def topic_counts_by_period(assignments, period="day", weighted=False):
+    """
+    Count chats per dominant topic for every period.
+
+    Returns (period_starts, matrix) where matrix[i, k] is the number of chats
+    in period i whose dominant topic is k, or their summed weight for topic k
+    if `weighted` is set.
+    """
+    import numpy as np
+
+    periods, codes = np.unique(
+        period_starts(assignments.timestamps, period), return_inverse=True
+    )
+    return periods, group_topics(codes, len(periods), assignments, weighted)
+
+
+def topic_counts_by_assistant(assignments, weighted=False):
+    """Count chats per dominant topic for every AssistantName, see `topic_counts_by_period`."""
+    return assignments.assistants, group_topics(
+        assignments.assistant_codes, len(assignments.assistants), assignments, weighted
+    )
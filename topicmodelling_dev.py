@@ -1,25 +1,26 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import NMF
 import logging
 import re
 import json
-import os
-from openai import AzureOpenAI
+from cloud_config import get_llm_client
+from instrumentation import measure, timed
 from preprocessor import preprocess_text
 
 
-# Initialize Azure OpenAI client
-llmclient = AzureOpenAI(
-    azure_endpoint=os.getenv("LLM_ENDPOINT"),
-    api_key=os.getenv("LLM_KEY"),
-    api_version="2024-10-01-preview",
-)
+@timed("extract_topics_from_text")
+def extract_topics_from_text(text, max_topics=5, max_top_words=10, cleaned_text=None):
+    """
+    Extract topics using NMF and return structured topic data in JSON format.
 
+    Pass `cleaned_text` when the caller has already preprocessed `text` to
+    avoid doing it twice.
+    """
+    # Deferred so that importing this module does not pay for sklearn
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.decomposition import NMF
 
-def extract_topics_from_text(text, max_topics=5, max_top_words=10):
-    """Extract topics using NMF and return structured topic data in JSON format."""
     try:
-        cleaned_text = preprocess_text(text)
+        if cleaned_text is None:
+            cleaned_text = preprocess_text(text)
         if len(cleaned_text.split()) < 10:
             logging.warning("Text too short for meaningful topic extraction")
             return []
@@ -32,8 +33,11 @@ def extract_topics_from_text(text, max_topics=5, max_top_words=10):
             max_features=1000,
         )
 
-        # Split text into sentences or chunks
-        sentences = text.split(".")
+        # Treat every chat title (one per line) as its own document, falling
+        # back to sentences or chunks for free text
+        sentences = [line for line in text.split("\n") if line.strip()]
+        if len(sentences) < 3:
+            sentences = text.split(".")
         if len(sentences) < 3:
             sentences = [
                 text[i : i + 100]
@@ -51,7 +55,8 @@ def extract_topics_from_text(text, max_topics=5, max_top_words=10):
 
         nmf = NMF(n_components=n_topics, random_state=42, max_iter=500, l1_ratio=0.5)
 
-        nmf_result = nmf.fit_transform(tfidf)
+        with measure("nmf_fit", documents=tfidf.shape[0], features=tfidf.shape[1]):
+            nmf_result = nmf.fit_transform(tfidf)
         feature_names = vectorizer.get_feature_names_out()
 
         topics = []
@@ -75,23 +80,25 @@ def extract_topics_from_text(text, max_topics=5, max_top_words=10):
                 }
             )
 
-        topic_analysis = ""
-        for topic_item in topics:
-            topic_analysis += (
-                f"Topic {topic_item['topic']} (score: {topic_item['score']:.2f}):\n"
-            )
-            for keyword in topic_item["keywords"]:
-                topic_analysis += (
-                    f"- {keyword['term']} (weight: {keyword['weight']:.2f})\n"
-                )
-
-        return interpret_topics_with_llm(text, topic_analysis)
+        return interpret_topics_with_llm(text, format_topic_analysis(topics))
 
     except Exception as e:
         logging.error(f"Error extracting topics: {e}")
         return []
 
 
+def format_topic_analysis(topics):
+    """Render extracted topics and their weighted keywords as prompt text."""
+    topic_analysis = ""
+    for topic_item in topics:
+        topic_analysis += (
+            f"Topic {topic_item['topic']} (score: {topic_item['score']:.2f}):\n"
+        )
+        for keyword in topic_item["keywords"]:
+            topic_analysis += f"- {keyword['term']} (weight: {keyword['weight']:.2f})\n"
+    return topic_analysis
+
+
 def interpret_topics_with_llm(text, raw_topics):
     """
     Use LLM to interpret raw topics and return structured interpretations in JSON format.
@@ -117,7 +124,7 @@ def interpret_topics_with_llm(text, raw_topics):
         Ensure your response can be parsed as valid JSON. Return ONLY the JSON array and nothing else.
         """
 
-        response = llmclient.chat.completions.create(
+        response = get_llm_client().chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
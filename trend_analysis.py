@@ -0,0 +1,181 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from cloud_config import (
+    TREND_CHUNK_TOKENS,
+    TREND_MAX_CHUNKS,
+    TREND_MAX_PARALLEL,
+    get_llm_client,
+)
+from instrumentation import submit
+
+SYSTEM_PROMPT = "You are an expert data analyst analyzing trends from user interaction data."
+
+
+def estimate_tokens(text):
+    """Rough token count for gpt-4o prompts (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def chunk_titles(titles, token_budget=TREND_CHUNK_TOKENS):
+    """Split titles into consecutive chunks whose estimated size fits the budget."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for title in titles:
+        title_tokens = estimate_tokens(title)
+        if current and current_tokens + title_tokens > token_budget:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(title)
+        current_tokens += title_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _complete(content, temperature=0.7):
+    response = get_llm_client().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": content},
+        ],
+        temperature=temperature,
+        stream=False,  # We want a complete response, not a stream
+    )
+    return response.choices[0].message.content
+
+
+def _stream_complete(content, temperature=0.7):
+    """Like `_complete`, but yields the response text as it arrives."""
+    response_stream = get_llm_client().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": content},
+        ],
+        temperature=temperature,
+        stream=True,
+    )
+    for chunk in response_stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _trend_prompt(titles_text):
+    return f"""
+    Analyze the following chat titles for trends, topics, and insights based on user interactions.
+    Provide a summary of key trends and observations.
+
+    Chat Titles:
+    {titles_text}
+    """
+
+
+def _chunk_prompt(titles_text, chunk_number, chunk_count):
+    return f"""
+    The following chat titles are part {chunk_number} of {chunk_count} of a larger set.
+    Summarize the key trends, recurring topics and notable observations in this part.
+    Mention how often themes recur so the parts can be combined later.
+
+    Chat Titles:
+    {titles_text}
+    """
+
+
+def _merge_prompt(partial_summaries):
+    joined = "\n\n---\n\n".join(partial_summaries)
+    return f"""
+    The following are trend summaries of consecutive parts of one set of chat titles.
+    Merge them into a single summary of key trends and observations for the whole set.
+    Combine overlapping themes instead of listing them per part.
+
+    Partial Summaries:
+    {joined}
+    """
+
+
+def _summarize_chunks(chunks, max_parallel):
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = [
+            submit(executor, _complete, _chunk_prompt("\n".join(chunk), i + 1, len(chunks)))
+            for i, chunk in enumerate(chunks)
+        ]
+        return [future.result() for future in futures]
+
+
+def _reduce_summaries(summaries, token_budget, max_parallel):
+    """
+    Merge partial summaries in rounds until they fit one prompt.
+
+    Returns the remaining summaries; the final merge is left to the caller so
+    that it can be streamed.
+    """
+    while len(summaries) > 1:
+        groups = chunk_titles(summaries, token_budget)
+        if len(groups) == 1:
+            break
+        if len(groups) == len(summaries):
+            # Each summary fills a prompt on its own; merge them pairwise.
+            groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = [
+                submit(executor, _complete, _merge_prompt(group)) for group in groups
+            ]
+            summaries = [future.result() for future in futures]
+    return summaries
+
+
+def stream_trends(
+    processed_titles,
+    token_budget=TREND_CHUNK_TOKENS,
+    max_parallel=TREND_MAX_PARALLEL,
+    max_chunks=TREND_MAX_CHUNKS,
+):
+    """
+    Summarize trends across preprocessed chat titles (see `preprocess_titles`),
+    yielding the report text as it is generated.
+
+    Titles that fit in one prompt are analyzed with a single call. Larger sets
+    are split into chunks of at most `token_budget` tokens, summarized with up
+    to `max_parallel` concurrent calls and merged into one report; only the
+    final merge is streamed. At most `max_chunks` chunks are sent; beyond that
+    titles are sampled evenly so the analysis time stays bounded.
+    """
+    processed = [title for title in processed_titles if title]
+    if not processed:
+        return
+
+    chunks = chunk_titles(processed, token_budget)
+    if len(chunks) == 1:
+        yield from _stream_complete(_trend_prompt("\n".join(chunks[0])))
+        return
+
+    if len(chunks) > max_chunks:
+        keep = len(processed) * max_chunks // len(chunks)
+        logging.warning(
+            f"Sampling {keep} of {len(processed)} titles to stay within {max_chunks} chunks"
+        )
+        processed = [processed[i * len(processed) // keep] for i in range(keep)]
+        chunks = chunk_titles(processed, token_budget)[:max_chunks]
+
+    summaries = _reduce_summaries(
+        _summarize_chunks(chunks, max_parallel), token_budget, max_parallel
+    )
+    if len(summaries) == 1:
+        yield summaries[0]
+    else:
+        yield from _stream_complete(_merge_prompt(summaries))
+
+
+def analyze_trends(
+    processed_titles,
+    token_budget=TREND_CHUNK_TOKENS,
+    max_parallel=TREND_MAX_PARALLEL,
+    max_chunks=TREND_MAX_CHUNKS,
+):
+    """Return the full trend report of `stream_trends` as one string."""
+    return "".join(
+        stream_trends(processed_titles, token_budget, max_parallel, max_chunks)
+    )
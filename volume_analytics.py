@@ -0,0 +1,45 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+PERIODS = ("day", "week", "month")
+
+
+def _check_period(period):
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+
+
+def _week_start(day):
+    date_obj = datetime.strptime(day, "%Y-%m-%d")
+    return (date_obj - timedelta(days=date_obj.weekday())).strftime("%Y-%m-%d")
+
+
+def rollup_volume(conn, start_date_str, end_date_str, period="day"):
+    """
+    Count chats per period and AssistantName from the rolling aggregates.
+
+    Reads a few pre-aggregated rows instead of the chats themselves. The
+    range is applied at period granularity: a month is counted whole if the
+    range touches it.
+    """
+    _check_period(period)
+    period_kind = "month" if period == "month" else "day"
+    length = 7 if period == "month" else 10
+    rows = conn.execute(
+        """
+        SELECT period, assistant, chats FROM chat_volume_rollup
+        WHERE period_kind = ? AND period BETWEEN ? AND ?
+        ORDER BY period
+        """,
+        (period_kind, start_date_str[:length], end_date_str[:length]),
+    )
+
+    counts = defaultdict(int)
+    for row in rows:
+        key = _week_start(row[0]) if period == "week" else row[0]
+        counts[(key, row[1])] += row[2]
+    return [
+        {"period": key, "assistant": assistant, "chats": chats}
+        for (key, assistant), chats in sorted(counts.items())
+    ]
+